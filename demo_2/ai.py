@@ -0,0 +1,369 @@
+import time
+import numpy as np
+
+from constants import *
+from physics import PhysicsWorld, FrictionField, GRENADE_EFFECT, bounceOffWalls
+from game import Match
+
+# computer player: tries lots of shots at once in a simplified copy of the physics, picks the one that gets the ball closest to goal
+# every candidate is a row in the same arrays, so a whole round of them costs about as much as a few real frames
+#   search = ShotSearch()
+#   search.start(match)        when it's the computer's turn
+#   search.think(AI_SLICE)     every frame, until search.done
+#   match.play(search.best())
+
+# ---------------------- define constants
+AI_BUDGET = 2.0 # seconds per turn, the best shot so far is taken when it runs out
+AI_SLICE = 0.008 # seconds of searching per frame, so the window keeps drawing
+AI_ROUNDS = 6 # rounds of candidates per turn: a broad sweep, powerups, refining the best, then checking them
+AI_HORIZON = FPS*3 # frames each rollout runs for, at most
+AI_STOPPED = 0.1 # pixels per frame, a rollout ends once nothing is faster, the ball can't go much further
+AI_REFINE = 96 # candidates per refining round
+AI_ELITES = 8 # best shots kept, refined & carried over to the team's next turn
+AI_VERIFY = 6 # best shots played out with the real physics in the last round
+AI_GOAL_BONUS = 1000 # score for scoring, minus this for an own goal
+AI_POWERUP_COST = 5 # a powerup has to be worth this many pixels of progress to be used
+AI_ANGLES = 12 # aimed directions per player in the broad sweep (plus as many spread all around)
+AI_SPEEDS = (0.5, 0.75, 1.0) # fractions of MAX_VEL in the broad sweep
+
+# ---------------------- define classes
+# a candidate: (player index in the team, angle, speed, powerup or None)
+# the powerup is (GRENADE or GLUE, x, y), same as Match.play takes
+
+# a round of candidates simulated together, pos & vel are (candidate, body, xy)
+# reduced fidelity: each frame every contact is solved once from the same positions, no sleeping, no swept checks
+class Rollout:
+    def __init__(self, search, candidates: list):
+        self.search = search
+        self.candidates = candidates
+        match, world = search.match, search.match.world
+        c, n = len(candidates), world.count
+        grenades = [i for i, candidate in enumerate(candidates) if candidate[3] is not None and candidate[3][0] == GRENADE]
+        total = n + (FRAG_COUNT if grenades else 0) # frag rows only when a candidate needs them
+
+        self.pos = np.zeros((c, total, 2)) # unused frag rows sit still in a corner
+        self.vel = np.zeros((c, total, 2))
+        self.pos[:, :n] = world.pos[:n]
+        self.vel[:, :n] = world.vel[:n]
+        self.size = np.concatenate((world.size[:n], np.full(total-n, FRAG_SIZE)))
+        self.mass = np.concatenate((world.mass[:n], np.full(total-n, FRAG_MASS)))
+        self.alive = np.ones((c, total), dtype=bool)
+        self.alive[:, n:] = False
+        self.bodies = n # rows after this are frags
+
+        # the shots
+        for i, (player, angle, speed, powerup) in enumerate(candidates):
+            self.vel[i, search.team[player]] = speed*np.cos(angle), speed*np.sin(angle)
+        if grenades:
+            directions = np.pi*np.arange(FRAG_COUNT)/(FRAG_COUNT/2) # same as spawnGrenade
+            spread = np.stack((np.cos(directions), np.sin(directions)), axis=1)*match.fragVel
+            for i in grenades:
+                self.pos[i, n:] = candidates[i][3][1:]
+                self.vel[i, n:] = spread
+                self.alive[i, n:] = True
+        self.glue = np.full((c, 2), np.nan) # one extra glue zone per candidate
+        for i, candidate in enumerate(candidates):
+            if candidate[3] is not None and candidate[3][0] == GLUE:
+                self.glue[i] = candidate[3][1:]
+
+        self.pairUp()
+
+        self.frame = 0
+        self.done = False
+        self.result = np.zeros(c) # +1 scored, -1 own goal, first one only
+
+    # every pair of bodies, and which bodies each pair pushes (+1) & pulls (-1)
+    # frags only hit bodies, same as the world's particles, so pairs of two frags are left out
+    def pairUp(self):
+        total = len(self.size)
+        first, second = np.triu_indices(total, 1)
+        withBody = first < self.bodies # first < second, so that's any pair with a body in it
+        self.first, self.second = first[withBody], second[withBody]
+        pairs = len(self.first)
+        push = np.zeros((pairs, total))
+        push[np.arange(pairs), self.first] = 1
+        push[np.arange(pairs), self.second] = -1
+        inverseMass = 1/self.mass
+        self.push = np.ascontiguousarray(push.T) # body, pair
+        self.kick = self.push*inverseMass[:, None]
+        self.inverseSum = inverseMass[self.first] + inverseMass[self.second]
+        self.reach = self.size[self.first] + self.size[self.second]
+
+    # the frags have run out, dropping their rows makes the rest of the rollout much cheaper
+    def dropFrags(self):
+        n = self.bodies
+        self.pos, self.vel = self.pos[:, :n].copy(), self.vel[:, :n].copy()
+        self.size, self.mass, self.alive = self.size[:n], self.mass[:n], self.alive[:, :n]
+        self.pairUp()
+
+    # steps until the rollout finishes or the clock passes stop, returns whether it has finished
+    def advance(self, stop: float):
+        search, world = self.search, self.search.match.world
+        while time.perf_counter() < stop:
+            c, total = self.pos.shape[:2]
+            flatPos, flatVel = self.pos.reshape(-1, 2), self.vel.reshape(-1, 2)
+            flatSize = np.broadcast_to(self.size, (c, total)).reshape(-1)
+            bounceOffWalls(world, flatPos, flatVel, flatSize)
+            self.pos += self.vel
+
+            inGlue = search.field.inZone(flatPos, flatSize).reshape(c, total)
+            toGlue = self.pos - self.glue[:, None, :]
+            with np.errstate(invalid="ignore"): # nan for candidates without a glue
+                inGlue |= (toGlue*toGlue).sum(axis=2) <= (GLUE_SIZE + self.size)**2
+            self.vel *= np.where(inGlue, world.glueFriction, world.friction)[:, :, None]
+
+            self.frame += 1
+            if self.frame == FRAG_LIFETIME+1 and len(self.size) > self.bodies: # frags are gone before they collide that frame
+                self.dropFrags()
+            self.collide(world)
+
+            self.result = np.where(self.result == 0, search.goalScored(self.pos[:, search.ball, 0]), self.result)
+
+            speed = (self.vel*self.vel).sum(axis=2)
+            if self.frame >= search.horizon or not (speed > AI_STOPPED**2).any():
+                self.done = True
+                break
+        return self.done
+
+    # every touching pair at once, pushes & impulses are summed per body
+    def collide(self, world):
+        delta = self.pos[:, self.first] - self.pos[:, self.second]
+        distance = np.sqrt((delta*delta).sum(axis=2))
+        overlap = self.reach - distance
+        hit = (overlap > 0) & self.alive[:, self.first] & self.alive[:, self.second]
+        if not hit.any():
+            return
+        distance[distance == 0] = 1 # on top of each other, pushed along x
+        normal = delta / distance[:, :, None]
+        normal[(delta == 0).all(axis=2)] = (1, 0)
+
+        separation = normal * np.where(hit, overlap*0.5, 0)[:, :, None]
+        relativeVelocity = self.vel[:, self.first] - self.vel[:, self.second]
+        velocityAlongNormal = (relativeVelocity*normal).sum(axis=2)
+        closing = hit & (velocityAlongNormal <= 0)
+        impulse = normal * (-(1 + world.restitution) * velocityAlongNormal / self.inverseSum)[:, :, None]
+        tangent = np.stack((-normal[:, :, 1], normal[:, :, 0]), axis=2)
+        frictionScalar = (relativeVelocity*tangent).sum(axis=2) * world.frictionCoefficient / self.inverseSum
+        total = (impulse - tangent*np.abs(frictionScalar)[:, :, None]) * closing[:, :, None]
+
+        self.pos += np.matmul(self.push, separation)
+        self.vel += np.matmul(self.kick, total)
+        np.clip(self.vel, -world.maxVel, world.maxVel, out=self.vel)
+
+    def scores(self):
+        return self.search.score(self.pos[:, self.search.ball], self.result, self.candidates)
+
+# the few best candidates again, one at a time in a copy of the real world with full physics
+# the game is deterministic, so this is exactly what the shot will do
+class ExactRollout:
+    def __init__(self, search, candidates: list):
+        self.search = search
+        self.candidates = candidates
+        self.world = PhysicsWorld()
+        self.current = -1 # candidate being played
+        self.ball = np.zeros((len(candidates), 2))
+        self.result = np.zeros(len(candidates))
+
+    def setUp(self, candidate: tuple):
+        search, world = self.search, self.world
+        search.match.world.copyInto(world)
+        world.frictionField.zones = list(search.field.zones)
+        np.copyto(world.frictionField.nearest, search.field.nearest)
+        player, angle, speed, powerup = candidate
+        if powerup is not None and powerup[0] == GLUE:
+            world.frictionField.add(powerup[1], powerup[2])
+        if powerup is not None and powerup[0] == GRENADE:
+            world.particles.spawn(GRENADE_EFFECT, powerup[1], powerup[2], world.frame, search.match.fragVel) # same as spawnGrenade
+        world.vel[search.team[player]] = speed*np.cos(angle), speed*np.sin(angle)
+        world.wake(search.team[player])
+        self.frame = 0
+
+    # steps until every candidate is played out or the clock passes stop, returns whether they all are
+    def advance(self, stop: float):
+        search, world = self.search, self.world
+        while time.perf_counter() < stop:
+            if self.current == -1 or self.frame >= search.horizon or not world.anyMoving():
+                if self.current >= 0:
+                    self.ball[self.current] = world.pos[search.ball]
+                self.current += 1
+                if self.current == len(self.candidates):
+                    return True
+                self.setUp(self.candidates[self.current])
+
+            # same as Match.step
+            world.step()
+            self.frame += 1
+            if not world.allAsleep():
+                world.collide()
+                world.updateSleep()
+            if self.result[self.current] == 0:
+                self.result[self.current] = search.goalScored(world.pos[search.ball, 0])
+        return False
+
+    def scores(self):
+        return self.search.score(self.ball, self.result, self.candidates)
+
+# picks a shot for the team whose turn it is, a round of candidates at a time
+# stop whenever, best() is always the best shot tried so far
+# the best shots of each team's turn seed its next turn, the board usually hasn't changed much
+class ShotSearch:
+    def __init__(self, seed=None, horizon=AI_HORIZON):
+        self.rng = np.random.default_rng(seed)
+        self.horizon = horizon
+        self.elites = {BLUE: [], RED: []} # (score, candidate) from each team's last turn
+        self.match = None
+        self.tried = []
+
+    # budget=None searches every round however long it takes, so the same seed always picks the same shots
+    def start(self, match: Match, budget=AI_BUDGET, rounds=AI_ROUNDS):
+        self.match = match
+        self.color = match.turn
+        self.deadline = None if budget is None else time.perf_counter() + budget
+        self.rounds = rounds
+        self.round = 0
+        self.rollout = None
+        self.tried = [] # (score, candidate), from the simplified physics
+        self.verified = [] # (score, candidate), the best of those played out exactly
+        self.finished = False
+
+        world = match.world
+        self.team = [player.index for player in match.teamPlayers(match.turn)]
+        self.ball = match.ball.index
+        self.goal = (world.right if self.color == BLUE else world.left, (world.goalTop + world.goalBottom)/2)
+        self.startDistance = np.hypot(match.ball.x-self.goal[0], match.ball.y-self.goal[1])
+        # glue that runs out when the shot is taken doesn't slow the rollouts
+        self.field = FrictionField(world.frictionField.width, world.frictionField.height)
+        for glue in match.glues:
+            if glue.lifetime != 1:
+                self.field.add(glue.x, glue.y)
+
+    # +1 where the ball is in the goal the team shoots at, -1 in its own goal
+    def goalScored(self, ballX):
+        world = self.match.world
+        scored = np.where(ballX > world.right, 1, np.where(ballX < world.left, -1, 0))
+        return scored if self.color == BLUE else -scored # red shoots left
+
+    # higher is better: how much closer the ball got to the goal, goals count for a lot
+    def score(self, ball: np.ndarray, result: np.ndarray, candidates: list):
+        distance = np.hypot(ball[:, 0]-self.goal[0], ball[:, 1]-self.goal[1])
+        scores = self.startDistance - distance + result*AI_GOAL_BONUS
+        return scores - AI_POWERUP_COST*np.array([candidate[3] is not None for candidate in candidates])
+
+    @property
+    def done(self):
+        return self.finished or (self.deadline is not None and time.perf_counter() >= self.deadline)
+
+    # searches for about seconds, returns whether the search is done
+    def think(self, seconds: float):
+        stop = time.perf_counter() + seconds
+        while not self.done and time.perf_counter() < stop:
+            if self.rollout is None:
+                self.rollout = self.nextRound()
+            if self.rollout.advance(stop):
+                tried = list(zip(self.rollout.scores().tolist(), self.rollout.candidates))
+                if isinstance(self.rollout, ExactRollout):
+                    self.verified = tried
+                else:
+                    self.tried.extend(tried)
+                self.rollout = None
+                self.round += 1
+                self.finished = self.round >= self.rounds
+        return self.done
+
+    # the best shot so far, in the format Match.play takes, & remembers the best for next turn
+    def best(self):
+        if self.tried:
+            self.elites[self.color] = self.ranked()
+        if self.verified:
+            player, angle, speed, powerup = max(self.verified, key=lambda tried: tried[0])[1]
+        elif self.tried:
+            player, angle, speed, powerup = self.ranked()[0][1]
+        else: # nothing finished yet, straight through the ball with the closest player
+            player, angle, speed, powerup = self.aimed()
+        # the drag that shotVelocity turns back into this velocity
+        return (player, -np.cos(angle)*speed*AIM_TWEAK, -np.sin(angle)*speed*AIM_TWEAK, powerup)
+
+    # searches the whole budget in one go, for headless play
+    def choose(self, match: Match, budget=AI_BUDGET, rounds=AI_ROUNDS):
+        self.start(match, budget, rounds)
+        while not self.think(AI_BUDGET):
+            pass
+        return self.best()
+
+    def aimed(self):
+        world = self.match.world
+        ball = world.pos[self.ball]
+        closest = min(range(len(self.team)), key=lambda i: ((world.pos[self.team[i]]-ball)**2).sum())
+        delta = ball - world.pos[self.team[closest]]
+        return (closest, float(np.arctan2(delta[1], delta[0])), MAX_VEL, None)
+
+    # the best distinct candidates tried, best first
+    def ranked(self, count=AI_ELITES):
+        ranked = []
+        for tried in sorted(self.tried, key=lambda tried: -tried[0]):
+            if tried[1] not in (candidate for score, candidate in ranked):
+                ranked.append(tried)
+            if len(ranked) == count:
+                break
+        return ranked
+
+    # broad sweep, powerups, refining, and the last round checks the best with the real physics
+    def nextRound(self):
+        if self.round == self.rounds-1:
+            return ExactRollout(self, [candidate for score, candidate in self.ranked(AI_VERIFY)])
+        if self.round == 0:
+            return Rollout(self, self.broad())
+        if self.round == 1 and self.match.powerup:
+            return Rollout(self, self.powerups())
+        return Rollout(self, self.refine(0.5**self.round))
+
+    # every player: aimed through the ball, all around, at a few speeds, plus last turn's best
+    def broad(self):
+        world = self.match.world
+        ball = world.pos[self.ball]
+        candidates = []
+        for player, index in enumerate(self.team):
+            delta = ball - world.pos[index]
+            aim = np.arctan2(delta[1], delta[0])
+            angles = np.concatenate((aim + np.linspace(-0.5, 0.5, AI_ANGLES), self.rng.uniform(0, 2*np.pi, AI_ANGLES)))
+            for angle in angles:
+                for speed in AI_SPEEDS:
+                    candidates.append((player, float(angle), speed*MAX_VEL, None))
+        for score, candidate in self.elites[self.color]:
+            if candidate[3] is None or self.match.powerup:
+                candidates.append(candidate)
+        return candidates
+
+    # the best shots so far, with a grenade behind the ball or a glue somewhere near it
+    def powerups(self):
+        world = self.match.world
+        ball = world.pos[self.ball]
+        toGoal = np.arctan2(self.goal[1]-ball[1], self.goal[0]-ball[0])
+        best = [candidate for score, candidate in self.ranked()]
+        candidates = []
+        for candidate in best:
+            for offset in np.linspace(-0.6, 0.6, 5): # behind the ball, blowing it toward the goal
+                direction = toGoal + np.pi + offset
+                x = ball[0] + np.cos(direction)*(BALL_SIZE+GRENADE_SIZE)
+                y = ball[1] + np.sin(direction)*(BALL_SIZE+GRENADE_SIZE)
+                if self.match.arena.inField(x, y):
+                    candidates.append(candidate[:3] + ((GRENADE, float(x), float(y)),))
+            for i in range(3):
+                x, y = ball + self.rng.normal(0, GLUE_SIZE*2, 2)
+                if self.match.arena.inField(x, y):
+                    candidates.append(candidate[:3] + ((GLUE, float(x), float(y)),))
+        return candidates
+
+    # small changes to the best shots, smaller each round
+    def refine(self, scale: float):
+        ranked = self.ranked()
+        candidates = []
+        for i in range(AI_REFINE):
+            player, angle, speed, powerup = ranked[i % len(ranked)][1]
+            angle += self.rng.normal(0, 0.2*scale)
+            speed = float(np.clip(speed + self.rng.normal(0, MAX_VEL*0.2*scale), 1, MAX_VEL))
+            if powerup is not None:
+                x, y = powerup[1:] + self.rng.normal(0, GRENADE_SIZE*scale, 2)
+                powerup = (powerup[0], float(x), float(y)) if self.match.arena.inField(x, y) else powerup
+            candidates.append((player, float(angle), speed, powerup))
+        return candidates
@@ -0,0 +1,133 @@
+import os, json, threading
+import pygame
+
+from constants import *
+
+# images & fonts, loaded once & shared
+# paths are relative to this file, so the game runs from any directory
+# images are converted to the display's pixel format the first time they're used after set_mode(), so blits don't convert every frame
+# where each font was found is kept on disk, searching the system fonts is the slowest part of starting up
+
+# ---------------------- define constants
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+BUTTON_IMAGES = ("buttons/info.png", "buttons/grenade.png", "buttons/glue.png")
+DISPLAY_FONT = ("krungthep", DISPLAY_SIZE)
+INFO_FONT = ("kefa", INFO_SIZE)
+SCORE_FONT = ("menlo", SCORE_SIZE)
+TITLE_FONT = ("bradleyhand", TITLE_SIZE)
+FONT_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "soccer", "fonts.json")
+
+# ---------------------- define classes
+class Assets:
+    def __init__(self, root=ASSET_DIR, fontCache=FONT_CACHE):
+        self.root = root
+        self.fontCache = fontCache # None: don't keep font paths between runs
+        self.cachedPaths = None # font name -> file, from the last runs
+        self.images = {} # relative path -> surface, converted once there's a display
+        self.loaded = {} # relative path -> surface straight from the file, not converted yet
+        self.fontPaths = {} # font name -> file (None: pygame's default font)
+        self.fonts = {} # (name, size) -> Font
+        self.pending = set() # what the preload() thread is still to load, names & paths
+        self.done = threading.Condition() # notified as it finishes each one
+
+    def path(self, relative: str):
+        return os.path.join(self.root, relative)
+
+    # the image at relative (to this file), in the display's format if there's a display yet
+    def image(self, relative: str):
+        surface = self.images.get(relative)
+        if surface is not None:
+            return surface
+        self.wait(relative)
+        surface = self.loaded.get(relative)
+        if surface is None:
+            surface = self.loaded[relative] = pygame.image.load(self.path(relative))
+        if pygame.display.get_surface() is None: # convert_alpha() needs a video mode, try again next time
+            return surface
+        surface = self.images[relative] = surface.convert_alpha()
+        del self.loaded[relative]
+        return surface
+
+    # like pygame.font.SysFont(name, size), but the system fonts are only searched once per name
+    def font(self, name: str, size: int):
+        font = self.fonts.get((name, size))
+        if font is None:
+            font = self.fonts[(name, size)] = pygame.font.Font(self.fontPath(name), size)
+        return font
+
+    def fontPath(self, name: str):
+        self.wait(name)
+        if name not in self.fontPaths:
+            self.fontPaths[name] = self.findFont(name)
+        return self.fontPaths[name]
+
+    # from the disk cache if the file's still there, else searched for (& the cache updated)
+    def findFont(self, name: str):
+        with self.done:
+            if self.cachedPaths is None:
+                self.cachedPaths = self.readFontCache()
+            if name in self.cachedPaths:
+                path = self.cachedPaths[name]
+                if path is None or os.path.exists(path):
+                    return path
+        path = pygame.font.match_font(name)
+        with self.done:
+            self.cachedPaths[name] = path
+            self.writeFontCache()
+        return path
+
+    def readFontCache(self):
+        if self.fontCache is None:
+            return {}
+        try:
+            with open(self.fontCache) as f:
+                paths = json.load(f)
+            return paths if isinstance(paths, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def writeFontCache(self):
+        if self.fontCache is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.fontCache), exist_ok=True)
+            temporary = self.fontCache + ".%d" % os.getpid()
+            with open(temporary, "w") as f:
+                json.dump(self.cachedPaths, f)
+            os.replace(temporary, self.fontCache) # never leaves half a file for the next run
+        except OSError:
+            pass # a read-only home just means searching every time
+
+    # finds fonts & loads images on a background thread, in that order, while the title screen shows
+    # only the files are read there, converting & making Font objects happen on the main thread when they're first used
+    def preload(self, images=(), fonts=()):
+        self.pending = {name for name, size in fonts} | set(images)
+        threading.Thread(target=self._preload, args=(images, fonts), daemon=True).start()
+
+    def _preload(self, images, fonts):
+        try:
+            for name, size in fonts:
+                if name not in self.fontPaths:
+                    self.fontPaths[name] = self.findFont(name)
+                self.finished(name)
+            for relative in images:
+                if relative not in self.images and relative not in self.loaded:
+                    self.loaded[relative] = pygame.image.load(self.path(relative))
+                self.finished(relative)
+        finally: # anything left gets loaded on the main thread, where errors show
+            with self.done:
+                self.pending.clear()
+                self.done.notify_all()
+
+    def finished(self, key):
+        with self.done:
+            self.pending.discard(key)
+            self.done.notify_all()
+
+    # blocks until the preload thread is done with key, if it's loading it
+    def wait(self, key):
+        with self.done:
+            while key in self.pending:
+                self.done.wait()
+
+assets = Assets() # shared by everything that draws
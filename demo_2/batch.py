@@ -0,0 +1,192 @@
+import os, sys, time, itertools, argparse
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # one banner per worker adds up
+import numpy as np
+
+from constants import *
+from game import Match, simulate
+from ai import ShotSearch
+
+# plays lots of headless matches across every CPU core for balance testing
+# results are written as columns (one array per stat), a part file every CHUNK_SIZE games:
+#   python batch.py --games 20000 --blue aim --red random --sweep GLUE_FRICTION=0.8,0.9,0.95 --out results
+
+# ---------------------- define constants
+CHUNK_SIZE = 1000 # games per part file
+MAX_FRAMES = 60*FPS*30 # give up on a game after 30 minutes of game time
+
+# constant name -> (object on the match, attribute) it is read from while playing
+TUNABLES = {
+    "FRICTION": ("world", "friction"),
+    "GLUE_FRICTION": ("world", "glueFriction"),
+    "RESTITUTION": ("world", "restitution"),
+    "FRICTION_COEFFICIENT": ("world", "frictionCoefficient"),
+    "FRAG_VEL": ("match", "fragVel"),
+}
+
+WINNERS = {None: 0, BLUE: 1, RED: 2} # winner column codes
+
+# ---------------------- shot policies
+# a policy picks the next shot for match.turn, in the format Match.play takes
+def randomPowerup(match: Match, rng: np.random.Generator, chance: float):
+    if rng.random() >= chance:
+        return None
+    arena = match.arena
+    while True:
+        x = rng.uniform(arena.leftGoalBack, arena.rightGoalBack)
+        y = rng.uniform(arena.top, arena.bottom)
+        if arena.inField(x, y):
+            return (GRENADE if rng.random() < 0.5 else GLUE, x, y)
+
+# any player, any direction, any power
+def randomPolicy(match: Match, rng: np.random.Generator):
+    team = match.teamPlayers(match.turn)
+    direction = rng.uniform(0, 2*np.pi)
+    drag = rng.uniform(0, MAX_VEL*AIM_TWEAK)
+    return (int(rng.integers(len(team))), np.cos(direction)*drag, np.sin(direction)*drag, randomPowerup(match, rng, 0.2))
+
+# player closest to the ball shoots through it, a little off line, grenade behind the ball sometimes
+def aimPolicy(match: Match, rng: np.random.Generator):
+    team = match.teamPlayers(match.turn)
+    ball = match.ball
+    index = min(range(len(team)), key=lambda i: (team[i].x-ball.x)**2 + (team[i].y-ball.y)**2)
+    player = team[index]
+
+    direction = np.arctan2(ball.y-player.y, ball.x-player.x) + rng.normal(0, 0.15)
+    drag = rng.uniform(0.5, 1.0)*MAX_VEL*AIM_TWEAK
+    powerup = None
+    if rng.random() < 0.15:
+        towardGoal = 1 if match.turn == BLUE else -1 # blue shoots right
+        powerup = (GRENADE, ball.x - towardGoal*(BALL_SIZE+GRENADE_SIZE), ball.y)
+        if not match.arena.inField(powerup[1], powerup[2]):
+            powerup = None
+    # the shot goes the opposite way to the drag
+    return (index, -np.cos(direction)*drag, -np.sin(direction)*drag, powerup)
+
+POLICIES = {"random": randomPolicy, "aim": aimPolicy}
+
+# the computer player (ai.py), fresh every game as it carries its best shots over between turns
+# it searches every round instead of to a time budget, so results don't depend on the machine
+def aiPolicy(seed: int):
+    search = ShotSearch(seed)
+    return lambda match, rng: search.choose(match, budget=None)
+
+POLICY_NAMES = list(POLICIES) + ["ai"]
+
+def makePolicy(name: str, rng: np.random.Generator):
+    if name == "ai":
+        return aiPolicy(int(rng.integers(2**32)))
+    return POLICIES[name]
+
+# ---------------------- define functions
+def shots(match: Match, policies: dict, rng: np.random.Generator):
+    while True:
+        yield policies[match.turn](match, rng)
+
+# plays one game in a worker process, returns one row of stats
+def playGame(job: tuple):
+    game, seed, bluePolicy, redPolicy, tuning = job
+    match = Match()
+    objects = {"match": match, "world": match.world}
+    for name, value in tuning.items():
+        owner, attr = TUNABLES[name]
+        setattr(objects[owner], attr, value)
+
+    rng = np.random.default_rng(seed)
+    policies = {BLUE: makePolicy(bluePolicy, rng), RED: makePolicy(redPolicy, rng)}
+    frames = simulate(match, shots(match, policies, rng), MAX_FRAMES)
+
+    row = {
+        "game": game,
+        "seed": seed,
+        "winner": WINNERS[match.winner()],
+        "turns": match.turns,
+        "frames": frames,
+        "blueGoals": match.blueScore,
+        "redGoals": match.redScore,
+        "blueGrenades": match.powerupsUsed[BLUE][GRENADE],
+        "blueGlues": match.powerupsUsed[BLUE][GLUE],
+        "redGrenades": match.powerupsUsed[RED][GRENADE],
+        "redGlues": match.powerupsUsed[RED][GLUE],
+    }
+    for name, value in tuning.items():
+        row[name] = value
+    return row
+
+# collects rows and writes them out column by column, so memory stays flat however many games run
+class ColumnWriter:
+    def __init__(self, outDir: str, chunkSize=CHUNK_SIZE):
+        self.outDir = outDir
+        self.chunkSize = chunkSize
+        self.rows = []
+        self.parts = 0
+        os.makedirs(outDir, exist_ok=True)
+
+    def add(self, row: dict):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = {name: np.array([row[name] for row in self.rows]) for name in self.rows[0]}
+        path = os.path.join(self.outDir, "part-%05d.npz" % self.parts)
+        np.savez(path, **columns)
+        self.parts += 1
+        self.rows = []
+
+# reads every part file back into one array per column
+def loadResults(outDir: str):
+    parts = sorted(name for name in os.listdir(outDir) if name.startswith("part-") and name.endswith(".npz"))
+    columns = {}
+    for name in parts:
+        with np.load(os.path.join(outDir, name)) as part:
+            for column in part.files:
+                columns.setdefault(column, []).append(part[column])
+    return {column: np.concatenate(arrays) for column, arrays in columns.items()}
+
+def parseSweep(sweeps: list):
+    names, values = [], []
+    for sweep in sweeps:
+        name, _, options = sweep.partition("=")
+        if name not in TUNABLES:
+            raise SystemExit("can't sweep %s, choose from %s" % (name, ", ".join(TUNABLES)))
+        names.append(name)
+        values.append([float(option) for option in options.split(",")])
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+def jobs(games: int, seed: int, bluePolicy: str, redPolicy: str, tunings: list):
+    game = 0
+    for tuning in tunings:
+        for i in range(games):
+            yield (game, seed+game, bluePolicy, redPolicy, tuning)
+            game += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless soccer matches in parallel.")
+    parser.add_argument("--games", type=int, default=1000, help="games per sweep combination")
+    parser.add_argument("--blue", choices=POLICY_NAMES, default="aim")
+    parser.add_argument("--red", choices=POLICY_NAMES, default="aim")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2,...", help="tuning constant to sweep, can repeat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="results")
+    args = parser.parse_args()
+
+    tunings = parseSweep(args.sweep)
+    total = args.games*len(tunings)
+    writer = ColumnWriter(args.out)
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        work = jobs(args.games, args.seed, args.blue, args.red, tunings)
+        for done, row in enumerate(pool.imap_unordered(playGame, work, chunksize=16), 1):
+            writer.add(row)
+            if done % 100 == 0 or done == total:
+                elapsed = time.perf_counter() - start
+                print("%d/%d games, %.1f games/s" % (done, total, done/elapsed), file=sys.stderr)
+    writer.flush()
+
+if __name__ == "__main__":
+    main()
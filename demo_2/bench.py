@@ -0,0 +1,212 @@
+import os, sys, gc, json, time, argparse, subprocess
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # draws into an offscreen surface, no window
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import numpy as np
+
+from constants import *
+from game import Arena, Match, PhysicalObject, Player, spawnGrenade
+from physics import Effect
+from render import DirtyRenderer
+import soccer
+
+# times the real physics & draw code paths on fixed scenarios, prints JSON
+#   python bench.py > before.json
+#   python bench.py --compare before.json
+
+# ---------------------- define constants
+PHASES = ("handleWallCollision", "updatePos", "particles", "collisions", "draw")
+FRAMES = 300 # frames timed per scenario
+STRESS_BODIES = 300
+BLASTS = 4
+PARTY_ARENA = (1400, 900, 200, 100) # field width, height, players a team, balls: 500 bodies
+# p99 of a whole frame (every phase above) a scenario has to stay under, in us
+# half a frame at FPS, the rest is for events, the HUD & the display
+TARGETS = {"party": 1e6/FPS/2}
+BLAST_EFFECT = Effect(128, FRAG_VEL, FRAG_MASS, FRAG_SIZE, FPS, BLACK) # bigger & longer lasting than a grenade
+
+# ---------------------- scenarios
+# each builds a Match in a fixed state, the same every run
+def kickoff():
+    match = Match()
+    match.kickoff()
+    match.play((2, -MAX_VEL*AIM_TWEAK, 0)) # blue centre player straight into the ball
+    return match
+
+# between turns, nothing moving
+def idle():
+    match = Match()
+    match.kickoff()
+    return match
+
+def grenadeInCrowd():
+    match = Match()
+    match.kickoff()
+    # pull everyone in around the ball
+    for i, player in enumerate(match.players):
+        angle = 2*np.pi*i/len(match.players)
+        player.x = match.ball.x + np.cos(angle)*(BALL_SIZE+PLAYER_SIZE+5)
+        player.y = match.ball.y + np.sin(angle)*(BALL_SIZE+PLAYER_SIZE+5)
+    spawnGrenade(match.world, match.ball.x, match.ball.y - BALL_SIZE - GRENADE_SIZE, match.fragVel)
+    return match
+
+# several big bursts at once, around the ball
+def blasts():
+    match = Match()
+    match.kickoff()
+    for i in range(BLASTS):
+        angle = 2*np.pi*i/BLASTS
+        x, y = match.ball.x + np.cos(angle)*GLUE_SIZE, match.ball.y + np.sin(angle)*GLUE_SIZE
+        spawnGrenade(match.world, x, y, match.fragVel, BLAST_EFFECT)
+    return match
+
+def gluePatch():
+    match = Match()
+    match.kickoff()
+    center = (SCREEN_WIDTH/2, SCREEN_HEIGHT/2)
+    match.placeGlue(center[0], center[1])
+    # all 6 players start inside the glue, moving
+    for i, player in enumerate(match.players):
+        angle = 2*np.pi*i/len(match.players)
+        player.x = center[0] + np.cos(angle)*GLUE_SIZE*0.6
+        player.y = center[1] + np.sin(angle)*GLUE_SIZE*0.6
+        player.v = (np.cos(angle+1)*MAX_VEL, np.sin(angle+1)*MAX_VEL)
+    return match
+
+def stressArena():
+    match = Match()
+    match.kickoff()
+    rng = np.random.default_rng(0)
+    for i in range(STRESS_BODIES - len(match.objects)):
+        x = rng.uniform(X_GAP+PLAYER_SIZE, X_GAP+FIELD_WIDTH-PLAYER_SIZE)
+        y = rng.uniform(Y_GAP+PLAYER_SIZE, Y_GAP+FIELD_HEIGHT-PLAYER_SIZE)
+        if i % 2:
+            body = Player(match.world, x, y, BLUE if i % 4 == 1 else RED)
+        else:
+            body = PhysicalObject(match.world, x, y, BALL_MASS, BALL_SIZE, WHITE)
+        body.v = rng.uniform(-MAX_VEL, MAX_VEL, 2)
+    match.scored = True # no goals, so every frame runs the same code
+    return match
+
+# the party mode load: every body of a 500 body arena moving at once
+def party():
+    match = Match(Arena(*PARTY_ARENA))
+    match.kickoff()
+    rng = np.random.default_rng(0)
+    for body in match.objects:
+        body.v = rng.uniform(-MAX_VEL, MAX_VEL, 2)
+    match.scored = True # no goals, so every frame runs the same code
+    return match
+
+SCENARIOS = {"idle": idle, "kickoff": kickoff, "grenade": grenadeInCrowd, "blasts": blasts, "glue": gluePatch, "stress": stressArena, "party": party}
+
+# ---------------------- define functions
+# one Match.step, with each phase timed separately
+def timedStep(match: Match, renderer: DirtyRenderer, times: dict):
+    world = match.world
+    asleep = world.allAsleep() # same fast path as PhysicsWorld.step
+    t0 = time.perf_counter()
+    if not asleep:
+        world.wallCollisions()
+    t1 = time.perf_counter()
+    if not asleep:
+        world.integrate()
+    world.frame += 1
+    t2 = time.perf_counter()
+    if not asleep:
+        world.particles.step(world)
+    t3 = time.perf_counter()
+    if not world.allAsleep():
+        match.collide()
+        world.updateSleep()
+    match.detectScore()
+    t4 = time.perf_counter()
+    soccer.queueObjects(renderer, match)
+    renderer.render()
+    t5 = time.perf_counter()
+
+    times["handleWallCollision"].append(t1-t0)
+    times["updatePos"].append(t2-t1)
+    times["particles"].append(t3-t2)
+    times["collisions"].append(t4-t3)
+    times["draw"].append(t5-t4)
+
+def runScenario(name: str, frames: int):
+    match = SCENARIOS[name]()
+    renderer = DirtyRenderer(pygame.Surface((match.arena.width, match.arena.height)), soccer.renderBackground(match.glues, match.arena))
+    gc.freeze() # same as soccer.main before a game
+    times = {phase: [] for phase in PHASES}
+    bodies = []
+    for i in range(frames):
+        bodies.append(match.world.count + match.world.particles.count)
+        timedStep(match, renderer, times)
+    gc.unfreeze() # or every scenario's match stays in memory for the rest of the run
+    gc.collect()
+
+    result = {"frames": frames, "meanBodies": float(np.mean(bodies)), "phases": {}}
+    for phase in PHASES:
+        result["phases"][phase] = stats(np.array(times[phase])*1e6)
+    result["frame"] = stats(sum(np.array(times[phase]) for phase in PHASES)*1e6)
+    if name in TARGETS:
+        result["frame"]["targetUs"] = round(TARGETS[name], 2)
+        result["frame"]["met"] = result["frame"]["p99Us"] <= TARGETS[name]
+    return result
+
+def stats(us: np.ndarray):
+    return {
+        "meanUs": round(float(us.mean()), 2),
+        "p50Us": round(float(np.percentile(us, 50)), 2),
+        "p99Us": round(float(np.percentile(us, 99)), 2),
+        "totalMs": round(float(us.sum()/1000), 3),
+    }
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+# prints new/old mean time for every phase, > 1 is slower
+def compare(report: dict, old: dict):
+    for name, scenario in report["scenarios"].items():
+        if name not in old["scenarios"]:
+            continue
+        for phase, stats in scenario["phases"].items():
+            if phase not in old["scenarios"][name]["phases"]:
+                continue
+            before = old["scenarios"][name]["phases"][phase]["meanUs"]
+            ratio = stats["meanUs"]/before if before else float("inf")
+            print("%-8s %-20s %10.1fus -> %10.1fus  x%.2f" % (name, phase, before, stats["meanUs"], ratio), file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark soccer physics & drawing on canned scenarios.")
+    parser.add_argument("scenarios", nargs="*", help="any of %s, default: all" % ", ".join(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", metavar="OLD_JSON", help="print the change against an earlier run")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario %s" % name)
+
+    pygame.display.init()
+    report = {"commit": gitCommit(), "frames": args.frames, "scenarios": {}}
+    for name in args.scenarios or SCENARIOS:
+        report["scenarios"][name] = runScenario(name, args.frames)
+        frame = report["scenarios"][name]["frame"]
+        if "targetUs" in frame:
+            print("%-8s p99 frame %.2fms, target %.2fms: %s" % (name, frame["p99Us"]/1000, frame["targetUs"]/1000, "met" if frame["met"] else "MISSED"), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os, re, sys, time, queue, atexit, argparse, threading, subprocess
+import pygame
+import numpy as np
+
+from constants import *
+
+# highlight clips of goals: the last few seconds of the game's surface are kept in memory, & saved once a goal's been scored
+#   python soccer.py --capture clips
+# the game loop only copies the surface's pixels into a slot of the ring each frame (one memcpy, no surfaces or bytes made),
+# a background thread writes the clip as raw video, PNGs are encoded from that in a separate process so they don't hold the GIL
+# raw clips are plain rgb24 frames back to back, with the size & rate in the name:
+#   ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 30 -i goal-20260101-120000-800x600-30fps.rgb goal.mp4
+# & can be turned into a folder of PNGs later:
+#   python capture.py clips/goal-20260101-120000-800x600-30fps.rgb
+
+# ---------------------- define constants
+PNG, RAW = "png", "raw"
+CAPTURE_SECONDS = 3 # of a clip before the goal
+AFTER_GOAL = 1 # seconds of the clip after the goal
+CAPTURE_EVERY = 2 # capture every 2nd frame, clips are FPS/2 frames a second
+CAPTURE_MEMORY = 256*2**20 # most bytes the ring can take, longer clips (or bigger windows) lose their oldest frames
+# the ring is (seconds + AFTER_GOAL)*FPS/CAPTURE_EVERY frames of the surface's own bytes,
+# 800x600 at 4 bytes a pixel is 1.92MB a frame, ~230MB for the default 4 second clip once it's filled up
+RAW_NAME = re.compile(r"(.*-(\d+)x(\d+))-[\d.]+fps\.rgb$") # a raw clip's name: NAME-WxH, then the rate
+
+# ---------------------- define classes
+# grab() after the frame's drawn, goal() the frame scored flips & flush() before the next kickoff
+# while a clip's being saved the ring belongs to the writer & frames aren't grabbed, so memory stays at one ring
+class GoalCapture:
+    def __init__(self, surface: pygame.Surface, directory: str, format=PNG, seconds=CAPTURE_SECONDS, every=CAPTURE_EVERY):
+        self.surface = surface
+        self.directory = directory
+        self.format = format
+        self.every = every
+        self.rate = FPS/every
+        self.size = surface.get_size()
+        # slots hold the surface's own pixel layout (pitch & all), the writer sorts out the channels
+        self.pitch = surface.get_pitch()
+        self.bytesize = surface.get_bytesize()
+        self.channels = [shift//8 for shift in surface.get_shifts()[:3]] # byte of r, g & b in a pixel (little endian)
+        self.afterFrames = max(1, int(AFTER_GOAL*self.rate))
+        frameBytes = self.pitch*self.size[1]
+        slots = min(max(1, int(seconds*self.rate)) + self.afterFrames, max(self.afterFrames + 1, CAPTURE_MEMORY//frameBytes))
+        # reserved, not touched: a slot only takes memory once a frame's been grabbed into it
+        self.ring = np.empty((slots, frameBytes), dtype=np.uint8)
+        self.count = 0 # frames grabbed, the newest is in slot (count-1) % slots
+        self.frames = 0 # frames seen, for every
+        self.afterGoal = -1 # captured frames left before the clip's handed over, -1 with no goal pending
+        self.saving = threading.Event() # set while the writer has the ring
+        self.jobs = queue.Queue() # (name, oldest slot, frame count), None to stop
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close) # a clip being written at exit is finished first
+
+    # copies the surface into the next slot
+    def grab(self):
+        if self.saving.is_set():
+            return
+        self.frames += 1
+        if self.frames % self.every:
+            return
+        self.ring[self.count % len(self.ring)] = np.frombuffer(self.surface.get_buffer(), dtype=np.uint8)
+        self.count += 1
+        if self.afterGoal > 0:
+            self.afterGoal -= 1
+            if self.afterGoal == 0:
+                self._handOver()
+
+    # keeps capturing a little longer, then saves the clip
+    def goal(self):
+        if self.afterGoal < 0 and not self.saving.is_set():
+            self.afterGoal = self.afterFrames
+
+    # saves a pending clip now, with whatever came after the goal so far (the game's about to move on)
+    def flush(self):
+        if self.afterGoal > 0:
+            self._handOver()
+
+    def _handOver(self):
+        frames = min(self.count, len(self.ring))
+        name = "goal-%s-%dx%d" % (time.strftime("%Y%m%d-%H%M%S"), *self.size)
+        self.saving.set()
+        self.jobs.put((name, (self.count - frames) % len(self.ring), frames))
+        self.count, self.frames, self.afterGoal = 0, 0, -1
+
+    # waits for the clip being written, if there is one
+    def close(self):
+        if self.thread.is_alive():
+            self.jobs.put(None)
+            self.thread.join()
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        while 1:
+            job = self.jobs.get()
+            if job is None:
+                return
+            name, first, frames = job
+            path = os.path.join(self.directory, "%s-%gfps.rgb" % (name, self.rate))
+            try:
+                with open(path, "wb") as f:
+                    for i in range(frames):
+                        f.write(self._rgb((first + i) % len(self.ring)))
+            except OSError as error:
+                print("couldn't save a clip: %s" % error, file=sys.stderr)
+                continue
+            finally:
+                self.saving.clear()
+            if self.format == PNG: # the conversion outlives the game if it has to
+                subprocess.Popen([sys.executable, os.path.abspath(__file__), "--remove", path])
+
+    # one slot as tightly packed rgb24
+    def _rgb(self, slot: int):
+        width, height = self.size
+        pixels = self.ring[slot].reshape(height, self.pitch)[:, :width*self.bytesize].reshape(height, width, self.bytesize)
+        return np.ascontiguousarray(pixels[:, :, self.channels])
+
+# ---------------------- define functions
+# writes a raw clip's frames as PNGs into a folder named like it (without the rate), returns the folder
+def rawToPng(path: str):
+    match = RAW_NAME.match(path)
+    if match is None:
+        raise ValueError("%s isn't named like a raw clip (NAME-WxH-RATEfps.rgb)" % path)
+    folder, width, height = match.group(1), int(match.group(2)), int(match.group(3))
+    frameBytes = width*height*3
+    with open(path, "rb") as f:
+        os.makedirs(folder, exist_ok=True)
+        for i in range(os.path.getsize(path)//frameBytes):
+            image = pygame.image.frombuffer(f.read(frameBytes), (width, height), "RGB")
+            pygame.image.save(image, os.path.join(folder, "frame-%04d.png" % i))
+    return folder
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn raw goal clips into folders of PNGs.")
+    parser.add_argument("paths", nargs="+", metavar="path")
+    parser.add_argument("--remove", action="store_true", help="delete each raw clip once it's converted")
+    args = parser.parse_args()
+    if hasattr(os, "nice"):
+        os.nice(10) # the game it was started from keeps the CPU
+    failed = False
+    for path in args.paths:
+        try:
+            rawToPng(path)
+        except (ValueError, OSError, pygame.error) as error:
+            print("couldn't convert %s: %s" % (path, error), file=sys.stderr)
+            failed = True
+            continue
+        if args.remove:
+            os.remove(path)
+    sys.exit(failed)
+
+if __name__ == "__main__":
+    main()
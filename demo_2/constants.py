@@ -0,0 +1,71 @@
+# ---------------------- shared constants for soccer.py and its modules
+# pygame
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+FPS = 60
+
+# text
+DISPLAY_SIZE = 80
+INFO_SIZE = 35
+SCORE_SIZE = 30
+TITLE_SIZE = 160
+
+# colors
+GREEN = (0, 170, 0)
+BLUE = (0, 0, 255)
+RED = (255, 0, 0)
+WHITE = (255, 255, 255)
+GOLD = (190, 190, 0)
+BLACK = (0, 0, 0)
+YELLOW = (210, 210, 0)
+TRANSPARENT_BLACK = (0, 0, 0, 185)
+TRANSPARENT_YELLOW = (210, 210, 0, 185)
+
+# game constants
+# field
+FIELD_WIDTH = 600
+FIELD_HEIGHT = 400
+X_GAP = (SCREEN_WIDTH-FIELD_WIDTH)/2
+Y_GAP = (SCREEN_HEIGHT-FIELD_HEIGHT)/2
+GOAL_DEPTH = 45
+GOAL_HEIGHT = 100
+GOAL_TOP = Y_GAP+FIELD_HEIGHT/2-GOAL_HEIGHT/2
+GOAL_BOTTOM = GOAL_TOP+GOAL_HEIGHT
+LEFT_GOAL_BACK = X_GAP-GOAL_DEPTH
+RIGHT_GOAL_BACK = SCREEN_WIDTH-X_GAP+GOAL_DEPTH
+# ball
+BALL_MASS = 8
+BALL_SIZE = 10
+# player
+PLAYER_MASS = 30
+PLAYER_SIZE = 20
+# grenade powerup
+GRENADE_SIZE = 15 # during powerup select
+FRAG_COUNT = 16
+FRAG_MASS = 40
+FRAG_SIZE = 3
+FRAG_VEL = FPS * 0.25
+FRAG_LIFETIME = round(FPS*0.12) # frames (120 milliseconds)
+# glue powerup
+GLUE_SIZE = 50
+GLUE_FRICTION = 0.9
+GLUE_LIFE = 3 # rounds - is removed the moment the 3rd round begins (player moves)
+# physics
+MAX_VEL = FPS*0.2
+AIM_TWEAK = 10 # smaller number = less difference bt big aim and small aim
+FRICTION = 0.97
+FRICTION_COEFFICIENT = 0.15 # for collisions
+RESTITUTION = 0.8 # bounciness
+# buttons
+NUM_BUTTONS = 2
+ICON_SIZE = 64
+BUTTON_GAP = Y_GAP/2
+BUTTON_Y = SCREEN_HEIGHT-Y_GAP/2-ICON_SIZE/2
+# misc
+SELECTED_THICKNESS = 5
+SPAWNS = ((FIELD_WIDTH/5, FIELD_HEIGHT/3), (FIELD_WIDTH/5,FIELD_HEIGHT*2/3), (FIELD_WIDTH/3, FIELD_HEIGHT/2))
+WIN_SCORE = 3
+
+# strings
+GRENADE = "Grenade"
+GLUE = "Glue"
@@ -0,0 +1,450 @@
+import pygame, struct
+import numpy as np
+
+from constants import *
+from physics import PhysicsWorld, Particles, KIND_BALL, KIND_PLAYER, GRENADE_EFFECT
+from profiler import PHYSICS, COLLISIONS
+
+# game objects & rules, nothing here needs a display
+
+# ---------------------- define constants
+COLOR_CODES = (WHITE, BLUE, RED, BLACK) # body colors, by their code in packed matches
+# turn, powerup, blueScore, redScore, scored, win, turns, powerupsUsed (blue grenade, blue glue, red grenade, red glue), glues
+MATCH_HEADER = struct.Struct("<BBBBBBI4HB")
+GLUE_RECORD = struct.Struct("<ddb") # x, y, lifetime
+SPAWN_GAP = PLAYER_SIZE*2.5 # generated player spawns are at least this far apart, centre to centre
+BALL_GAP = BALL_SIZE*3 # same for the balls
+
+# ---------------------- define classes
+# a view into one row of a PhysicsWorld, the world owns the actual state
+class PhysicalObject:
+    kind = KIND_BALL
+
+    def __init__(self, world: PhysicsWorld, x: int, y: int, mass: int, size: int, color: tuple, type=""):
+        self.world = world
+        self.color = color
+        self.type = type
+        self.index = world.add(self, x, y, mass, size, self.kind)
+
+    @property
+    def x(self):
+        return self.world.pos[self.index, 0]
+    @x.setter
+    def x(self, value):
+        self.world.pos[self.index, 0] = value
+        self.world.wake(self.index)
+
+    @property
+    def y(self):
+        return self.world.pos[self.index, 1]
+    @y.setter
+    def y(self, value):
+        self.world.pos[self.index, 1] = value
+        self.world.wake(self.index)
+
+    @property
+    def v(self): # writable view, so v[0] = ... and v += ... change the world
+        return self.world.vel[self.index]
+    @v.setter
+    def v(self, value): # assigning (v = ..., v += ...) wakes the body, v[0] = ... does not
+        self.world.vel[self.index] = value
+        self.world.wake(self.index)
+
+    @property
+    def mass(self):
+        return self.world.mass[self.index]
+
+    @property
+    def size(self): # radius of circle
+        return self.world.size[self.index]
+
+    @property
+    def moving(self):
+        return self.world.moving[self.index]
+
+    def draw(self, surf: pygame.Surface):
+        pygame.draw.circle(surf, self.color, (self.x, self.y), self.size)
+
+class Player(PhysicalObject):
+    kind = KIND_PLAYER
+    hovered = False
+    def __init__(self, world, x, y, color):
+        super().__init__(world, x, y, PLAYER_MASS, PLAYER_SIZE, color)
+
+    def draw(self, surf):
+        super().draw(surf)
+        if self.hovered:
+            pygame.draw.circle(surf, WHITE, (self.x, self.y), self.size, width=SELECTED_THICKNESS)
+
+class FieldObject:
+    def __init__ (self, x: int, y: int, size: int, color: tuple, lifetime=-1):
+        self.x = x
+        self.y = y
+        self.size = size
+        self.color = color
+        self.lifetime = lifetime
+    
+    def draw(self, surf: pygame.Surface):
+        pygame.draw.circle(surf, self.color, (self.x, self.y), self.size)
+
+# a match's state copied into buffers that are reused, see Match.snapshot() & Match.restore()
+# the views aren't copied, only which row each was on, so taking one allocates next to nothing
+class Snapshot:
+    def __init__(self):
+        self.arrays = {} # name -> buffer, sized to the world's capacity
+        self.count = 0
+        self.frame = 0
+        self.bodies = [] # views in row order
+        self.glues = []
+        self.lifetimes = [] # of the glues, they count down in place
+        self.zones = []
+        self.nearest = None # friction field grid
+        self.particles = Particles()
+        self.state = None # the match's own fields
+
+    # buffers as big as the world's arrays, only allocated again if the world has grown
+    def reserve(self, world: PhysicsWorld):
+        for name in world.ARRAYS:
+            source, buffer = getattr(world, name), self.arrays.get(name)
+            if buffer is None or len(buffer) < len(source):
+                self.arrays[name] = np.empty_like(source)
+        if self.nearest is None:
+            self.nearest = np.empty_like(world.frictionField.nearest)
+
+# the size of the field, how many players a team has & how many balls there are
+# the defaults are the classic 3 a side game, the window is the field with the same margins around it as that one
+class Arena:
+    def __init__(self, fieldWidth=FIELD_WIDTH, fieldHeight=FIELD_HEIGHT, players=len(SPAWNS), balls=1, goalHeight=GOAL_HEIGHT):
+        self.fieldWidth = fieldWidth
+        self.fieldHeight = fieldHeight
+        self.players = players # per team
+        self.balls = balls
+        self.goalHeight = goalHeight
+        self.width = fieldWidth + 2*X_GAP # window
+        self.height = fieldHeight + 2*Y_GAP
+        self.left = X_GAP
+        self.top = Y_GAP
+        self.right = X_GAP + fieldWidth
+        self.bottom = Y_GAP + fieldHeight
+        self.goalTop = Y_GAP + fieldHeight/2 - goalHeight/2
+        self.goalBottom = self.goalTop + goalHeight
+        self.leftGoalBack = self.left - GOAL_DEPTH
+        self.rightGoalBack = self.right + GOAL_DEPTH
+
+    def inField(self, x: float, y: float):
+        if (x > self.left and x < self.right) and (y > self.top and y < self.bottom):
+            return True # main part of field
+        if (x > self.leftGoalBack and x < self.rightGoalBack) and (y > self.goalTop and y < self.goalBottom):
+            return True # goals
+        return False
+
+    # where a team's players start: columns in its own half, back ones first & fuller, each top to bottom
+    # 3 players gives the classic layout (SPAWNS), more spread towards halfway when the columns would be too close
+    def spawns(self, color: tuple):
+        w, h = self.fieldWidth, self.fieldHeight
+        columns = int(np.ceil(np.sqrt(self.players*w/(2*h)))) # about as many across as down, for half the field
+        front = w/3
+        if columns > 1:
+            front = max(front, min(w/2 - 2*SPAWN_GAP, w/5 + (columns-1)*SPAWN_GAP))
+        back = max(SPAWN_GAP, min(w/5, front - (columns-1)*SPAWN_GAP)) # closer together rather than on the goal line
+        spawns = []
+        for x, count in zip(np.linspace(back, front, columns).tolist(), evenSplit(self.players, columns)):
+            for k in range(count):
+                y = self.top + h*(k+1)/(count+1)
+                spawns.append((self.left + x, y) if color == BLUE else (self.right - x, y))
+        return spawns
+
+    # where the balls start: columns down the halfway line, centred on the spot
+    def ballSpawns(self):
+        perColumn = max(1, int(self.fieldHeight//BALL_GAP) - 1)
+        columns = int(np.ceil(self.balls/perColumn))
+        spawns = []
+        for column, count in enumerate(evenSplit(self.balls, columns)):
+            x = self.left + self.fieldWidth/2 + (column - (columns-1)/2)*BALL_GAP
+            for k in range(count):
+                spawns.append((x, self.top + self.fieldHeight*(k+1)/(count+1)))
+        return spawns
+
+# the state & rules of one game, independent of the window so it can also run headless
+class Match:
+    def __init__(self, arena=None):
+        self.arena = Arena() if arena is None else arena
+        self.world = PhysicsWorld()
+        self.world.setField(self.arena)
+        self.objects = self.world.bodies # same list as the world's, so it follows adds & removes
+        self.ball = None # the first of the balls, the one the computer player goes for
+        self.balls = []
+        self.players = []
+        self.glues = []
+
+        self.turn = BLUE
+        self.powerup = True # can the current turn still use a powerup
+        self.blueScore = 0
+        self.redScore = 0
+        self.scored = True # start at True to set inital object positions
+        self.win = False
+
+        # stats
+        self.turns = 0
+        self.powerupsUsed = {BLUE: {GRENADE: 0, GLUE: 0}, RED: {GRENADE: 0, GLUE: 0}}
+
+        # tuning, the physics ones live on self.world
+        self.fragVel = FRAG_VEL
+
+        self.recorder = None # gets every shot & powerup before it changes anything, see replay.py & net.py
+        self.profiler = None # told when the physics & the collisions are done each step, see profiler.py
+
+    def nothingMoving(self):
+        return not self.world.anyMoving()
+
+    # after a goal, let it run until everything stops moving, then reset
+    def readyForKickoff(self):
+        return self.scored and not self.win and self.nothingMoving()
+
+    def kickoff(self):
+        self.world.clear()
+        self.balls = [PhysicalObject(self.world, x, y, BALL_MASS, BALL_SIZE, WHITE) for x, y in self.arena.ballSpawns()]
+        self.ball = self.balls[0]
+        for blue, red in zip(self.arena.spawns(BLUE), self.arena.spawns(RED)):
+            Player(self.world, blue[0], blue[1], BLUE)
+            Player(self.world, red[0], red[1], RED)
+        self.players = self.objects[len(self.balls):]
+        self.scored = False
+
+    def teamPlayers(self, color: tuple):
+        return [player for player in self.players if player.color == color]
+
+    # powerups return whether they were placed (only inside the field)
+    def placeGrenade(self, x: float, y: float):
+        if not (self.powerup and self.arena.inField(x, y)):
+            return False
+        if self.recorder is not None:
+            self.recorder.grenade(self.world.frame, x, y)
+        spawnGrenade(self.world, x, y, self.fragVel)
+        self.powerup = False
+        self.powerupsUsed[self.turn][GRENADE] += 1
+        return True
+
+    def placeGlue(self, x: float, y: float):
+        if not (self.powerup and self.arena.inField(x, y)):
+            return False
+        if self.recorder is not None:
+            self.recorder.glue(self.world.frame, x, y)
+        self.glues.append(FieldObject(x, y, GLUE_SIZE, YELLOW, lifetime = GLUE_LIFE))
+        self.world.frictionField.add(x, y)
+        self.powerup = False
+        self.powerupsUsed[self.turn][GLUE] += 1
+        return True
+
+    # launches a player, then swaps turns for a new round
+    def shoot(self, player: Player, vel):
+        if self.recorder is not None:
+            self.recorder.shot(self.world.frame, player.index, vel)
+        player.v = vel
+        self.turns += 1
+
+        if self.turn == RED:
+            self.turn = BLUE
+        else:
+            self.turn = RED
+        self.powerup = True
+        for glue in self.glues:
+            glue.lifetime -= 1
+            if glue.lifetime == 0:
+                self.world.frictionField.remove(glue.x, glue.y)
+        self.glues = [glue for glue in self.glues if glue.lifetime != 0]
+        if self.recorder is not None:
+            self.recorder.turn(self)
+
+    # plays a scripted shot: (player index in the current team, dragX, dragY[, (powerup, x, y)])
+    def play(self, shot: tuple):
+        if len(shot) > 3 and shot[3] is not None:
+            name, x, y = shot[3]
+            if name == GRENADE:
+                self.placeGrenade(x, y)
+            if name == GLUE:
+                self.placeGlue(x, y)
+        self.shoot(self.teamPlayers(self.turn)[shot[0]], shotVelocity(shot[1], shot[2]))
+
+    # one frame of the game, returns the color that scored this frame (or None)
+    def step(self):
+        # wall collision, movement & friction for every object at once
+        self.world.step()
+        if self.profiler is not None:
+            self.profiler.mark(PHYSICS)
+        if not self.world.allAsleep(): # everything asleep, nothing can collide
+            self.collide()
+            self.world.updateSleep()
+        if self.profiler is not None:
+            self.profiler.mark(COLLISIONS)
+        return self.detectScore()
+
+    def collide(self):
+        self.world.collide()
+
+    # returns the color that scored (or None), any ball counts
+    def detectScore(self):
+        if self.scored:
+            return None
+        ballX = [ball.x for ball in self.balls]
+        if min(ballX) < self.arena.left:
+            scorer = RED
+            self.redScore += 1
+            self.win = self.redScore >= WIN_SCORE
+            self.turn = BLUE
+        elif max(ballX) > self.arena.right:
+            scorer = BLUE
+            self.blueScore += 1
+            self.win = self.blueScore >= WIN_SCORE
+            self.turn = RED
+        else:
+            return None
+        self.scored = True
+        self.powerup = False
+        return scorer
+
+    def winner(self):
+        if not self.win:
+            return None
+        return BLUE if self.blueScore > self.redScore else RED
+
+    # copies the state into snapshot (a new one if None) to restore() later, for undo & trying moves out
+    def snapshot(self, snapshot=None):
+        if snapshot is None:
+            snapshot = Snapshot()
+        world, n = self.world, self.world.count
+        snapshot.reserve(world)
+        for name in world.ARRAYS:
+            np.copyto(snapshot.arrays[name][:n], getattr(world, name)[:n])
+        snapshot.count, snapshot.frame = n, world.frame
+        snapshot.bodies[:] = world.bodies
+        world.particles.copyInto(snapshot.particles)
+        snapshot.glues[:] = self.glues
+        snapshot.lifetimes[:] = (glue.lifetime for glue in self.glues)
+        snapshot.zones[:] = world.frictionField.zones
+        np.copyto(snapshot.nearest, world.frictionField.nearest)
+        used = self.powerupsUsed
+        snapshot.state = (self.ball, self.balls, self.players, self.turn, self.powerup, self.blueScore, self.redScore, self.scored, self.win, self.turns,
+                          used[BLUE][GRENADE], used[BLUE][GLUE], used[RED][GRENADE], used[RED][GLUE])
+        return snapshot
+
+    # puts the match back as it was when snapshot was taken, the same view objects included
+    def restore(self, snapshot: Snapshot):
+        world, n = self.world, snapshot.count
+        for body in world.bodies: # anything added since is gone
+            body.index = -1
+        world.count = min(world.count, n)
+        while len(world.mass) < n:
+            world._grow()
+        for name in world.ARRAYS:
+            np.copyto(getattr(world, name)[:n], snapshot.arrays[name][:n])
+        world.count, world.frame = n, snapshot.frame
+        world.bodies[:] = snapshot.bodies
+        for i, body in enumerate(world.bodies):
+            body.index = i
+        snapshot.particles.copyInto(world.particles)
+        self.glues[:] = snapshot.glues
+        for glue, lifetime in zip(self.glues, snapshot.lifetimes):
+            glue.lifetime = lifetime
+        world.frictionField.zones[:] = snapshot.zones
+        np.copyto(world.frictionField.nearest, snapshot.nearest)
+        used = self.powerupsUsed
+        (self.ball, self.balls, self.players, self.turn, self.powerup, self.blueScore, self.redScore, self.scored, self.win, self.turns,
+         used[BLUE][GRENADE], used[BLUE][GLUE], used[RED][GRENADE], used[RED][GLUE]) = snapshot.state
+
+    # the whole state of the match as bytes (tuning & recorder aside), see unpack()
+    def pack(self):
+        used = self.powerupsUsed
+        data = [MATCH_HEADER.pack(COLOR_CODES.index(self.turn), self.powerup, self.blueScore, self.redScore, self.scored, self.win, self.turns,
+                                  used[BLUE][GRENADE], used[BLUE][GLUE], used[RED][GRENADE], used[RED][GLUE], len(self.glues))]
+        for glue in self.glues:
+            data.append(GLUE_RECORD.pack(glue.x, glue.y, glue.lifetime))
+        # what kind of view each row needs, then the rows themselves
+        data.append(struct.pack("<I", len(self.objects)))
+        data.append(bytes(COLOR_CODES.index(obj.color) for obj in self.objects))
+        data.append(self.world.pack())
+        return b"".join(data)
+
+    # replaces the state with pack() bytes, rebuilding every view, returns the offset after them
+    def unpack(self, data, offset=0):
+        header = MATCH_HEADER.unpack_from(data, offset)
+        offset += MATCH_HEADER.size
+        turn, self.powerup, self.blueScore, self.redScore, self.scored, self.win, self.turns = header[:7]
+        self.turn = COLOR_CODES[turn]
+        self.powerup, self.scored, self.win = bool(self.powerup), bool(self.scored), bool(self.win)
+        self.powerupsUsed = {BLUE: {GRENADE: header[7], GLUE: header[8]}, RED: {GRENADE: header[9], GLUE: header[10]}}
+
+        self.glues = []
+        self.world.frictionField.clear()
+        for i in range(header[11]):
+            x, y, lifetime = GLUE_RECORD.unpack_from(data, offset)
+            offset += GLUE_RECORD.size
+            self.glues.append(FieldObject(x, y, GLUE_SIZE, YELLOW, lifetime=lifetime))
+            self.world.frictionField.add(x, y)
+
+        count, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        colors = data[offset:offset+count]
+        offset += count
+
+        # views first (they add rows), then the rows are overwritten with the packed state
+        self.world.clear()
+        self.balls, self.players = [], []
+        for code in colors:
+            color = COLOR_CODES[code]
+            if color in (BLUE, RED):
+                self.players.append(Player(self.world, 0, 0, color))
+            else:
+                self.balls.append(PhysicalObject(self.world, 0, 0, BALL_MASS, BALL_SIZE, color))
+        self.ball = self.balls[0] if self.balls else None
+        return self.world.unpack(data, offset)
+
+# runs a match without a window as fast as possible, using frame counts for time
+# shots are taken in order each time everything stops moving, see Match.play for their format
+# the same match & shots always give the same result, returns the number of frames simulated
+def simulate(state: Match, shots, max_steps: int):
+    shots = iter(shots)
+    for frame in range(max_steps):
+        if state.scored:
+            if state.win and state.nothingMoving():
+                return frame
+            if state.readyForKickoff():
+                state.kickoff()
+                continue
+        elif state.nothingMoving():
+            shot = next(shots, None)
+            if shot is None:
+                return frame
+            state.play(shot)
+        state.step()
+    return max_steps
+
+#  ---------------------- define functions
+def distance(x1: int, y1: int, x2: int, y2: int):
+    return np.sqrt( (x1-x2)**2 + (y1-y2)**2 )
+
+def angle(x1: int, y1: int, x2: int, y2: int):
+    return np.atan2( (y2-y1), (x2-x1) )
+
+def vectorToXY(magnitude: int, direction: float):
+    x = np.cos(direction)*magnitude
+    y = np.sin(direction)*magnitude
+    return x, y
+
+# count split into parts as even as can be, the first ones get the extras
+def evenSplit(count: int, parts: int):
+    return [count//parts + (i < count % parts) for i in range(parts)]
+
+# a burst of fragments into the world's particle pool, they expire by frame count so headless runs match real ones
+def spawnGrenade(world: PhysicsWorld, x: int, y: int, speed=FRAG_VEL, effect=GRENADE_EFFECT):
+    world.particles.spawn(effect, x, y, world.frame, speed)
+
+# velocity for a shot dragged by (dragX, dragY), applying a slight tweak
+def shotVelocity(dragX: float, dragY: float):
+    vel = np.array([-dragX/AIM_TWEAK, -dragY/AIM_TWEAK], dtype=np.float64)
+
+    # limit velocity to MAX_VEL
+    speed = np.sqrt(vel[0]**2 + vel[1]**2)
+    if speed > MAX_VEL:
+        vel *= MAX_VEL/speed
+    return vel
@@ -0,0 +1,365 @@
+import sys, zlib, queue, socket, struct, asyncio, argparse, threading
+import numpy as np
+
+from constants import *
+from game import Match, Snapshot
+from replay import RECORD, SHOT, GRENADE_PLACED, GLUE_PLACED, SHOT_DATA, POWERUP_DATA
+
+# online play: each player runs the whole game, only the inputs go over the network (the same records replays use)
+# both sides step the same frames in the same order, so the matches stay identical
+# every input carries a checksum of the state it was made in, and a side that has drifted is sent the difference
+#   python net.py serve --port 5005
+#   python soccer.py --connect localhost:5005        (on each machine)
+#   python net.py selftest                            (two headless players over localhost)
+
+# ---------------------- define constants
+PORT = 5005
+MESSAGE = struct.Struct("<BI") # kind, length of what follows
+START, INPUT, OK, RESYNC, STATE = range(5)
+START_DATA = struct.Struct("<B") # 0 blue, 1 red
+INPUT_DATA = struct.Struct("<II") # input number, checksum of the state before it, then the record
+SEQ_DATA = struct.Struct("<I") # OK & RESYNC: input number
+STATE_DATA = struct.Struct("<II") # input number, what it's a difference from (NO_BASE: nothing), then the compressed state
+NO_BASE = 0xFFFFFFFF
+KEPT_STATES = 16 # states kept to answer RESYNC & to take differences from
+COLORS = (BLUE, RED)
+
+# ---------------------- define classes
+# a connection to the server on a background thread, the game loop only ever polls it
+class Client:
+    # wake: called (on the network thread) whenever a message comes in, or None
+    def __init__(self, host: str, port: int, wake=None):
+        self.host, self.port = host, port
+        self.wake = wake
+        self.inbox = queue.Queue() # (kind, payload), None once the connection is gone
+        self.loop = asyncio.new_event_loop()
+        self.writer = None
+        self.connected = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._receive())
+        except OSError as error:
+            self.error = error
+        self.inbox.put(None)
+        self.connected.set() # don't leave anyone waiting on a failed connection
+        if self.wake is not None:
+            self.wake()
+
+    async def _receive(self):
+        reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        noDelay(self.writer)
+        self.connected.set()
+        while True:
+            message = await readMessage(reader)
+            if message is None:
+                return
+            self.inbox.put(message)
+            if self.wake is not None:
+                self.wake()
+
+    # safe from any thread, never blocks
+    def send(self, kind: int, payload: bytes):
+        data = MESSAGE.pack(kind, len(payload)) + payload
+        self.loop.call_soon_threadsafe(self._write, data)
+
+    def _write(self, data: bytes):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(data)
+
+    # every message received since the last poll
+    def poll(self):
+        messages = []
+        while True:
+            try:
+                messages.append(self.inbox.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        if self.writer is not None:
+            self.loop.call_soon_threadsafe(self.writer.close)
+
+# keeps a local match in step with the other player's, set as match.recorder so local inputs get sent
+# the other side's inputs are applied on the frame they were made on: while it's their turn and nothing is moving
+# this side waits (paused()), then catches up to the input's frame when it arrives
+# if it ever ran past that frame it goes back to the last input (a snapshot) & plays forward from there
+class NetMatch:
+    def __init__(self, client: Client, match: Match):
+        self.client = client
+        self.match = match
+        match.recorder = self
+        self.color = None # ours, once the server starts the game
+        self.closed = False
+        self.applying = False # an input from the other side is being applied, don't send it back
+        self.sent = 0 # inputs sent
+        self.sentStates = {} # input number -> packed state it was made in
+        self.agreed = (NO_BASE, b"") # last input number both sides checked, & the state then
+        self.receivedStates = {} # input number -> our packed state, for the ones we checked
+        self.pending = [] # (input number, checksum, record kind, frame, record data) from the other side
+        self.held = None # the input we're waiting on a STATE for
+        self.anchor = Snapshot() # the state the last input (ours or theirs) was made in
+        self.anchorInput = None # (record kind, frame, record data), None for the start of the match
+        self.inputFrame = -1
+        self.rollbacks = 0
+        self.resyncs = 0
+
+    @property
+    def started(self):
+        return self.color is not None
+
+    # whether the game loop should skip its step this frame
+    def paused(self):
+        match = self.match
+        if not self.started or self.held is not None:
+            return True
+        return match.turn != self.color and not match.scored and self.settled()
+
+    # nothing's moving, moving flags only catch up with an input on the next step so it waits for one
+    def settled(self):
+        return self.match.world.frame > self.inputFrame and self.match.nothingMoving()
+
+    # ---------------------- the Recorder calls from Match, our inputs
+    def shot(self, frame: int, index: int, vel):
+        self.sendInput(SHOT, frame, SHOT_DATA.pack(index, vel[0], vel[1]))
+
+    def grenade(self, frame: int, x: float, y: float):
+        self.sendInput(GRENADE_PLACED, frame, POWERUP_DATA.pack(x, y))
+
+    def glue(self, frame: int, x: float, y: float):
+        self.sendInput(GLUE_PLACED, frame, POWERUP_DATA.pack(x, y))
+
+    def turn(self, match: Match):
+        pass
+
+    def sendInput(self, kind: int, frame: int, data: bytes):
+        if self.applying:
+            return
+        self.remember(kind, frame, data)
+        packed = self.match.pack() # Match calls before changing anything
+        self.sent += 1
+        self.sentStates[self.sent] = packed
+        self.sentStates.pop(self.sent-KEPT_STATES, None)
+        self.client.send(INPUT, INPUT_DATA.pack(self.sent, zlib.crc32(packed)) + RECORD.pack(kind, frame) + data)
+
+    # ---------------------- messages from the other side
+    # call once a frame where the game loop handles input, never blocks
+    def poll(self):
+        for message in self.client.poll():
+            if message is None:
+                self.closed = True
+                break
+            kind, payload = message
+            if kind == START:
+                self.color = COLORS[START_DATA.unpack(payload)[0]]
+                self.match.snapshot(self.anchor)
+            elif kind == INPUT:
+                seq, checksum = INPUT_DATA.unpack_from(payload)
+                recordKind, frame = RECORD.unpack_from(payload, INPUT_DATA.size)
+                self.pending.append((seq, checksum, recordKind, frame, payload[INPUT_DATA.size+RECORD.size:]))
+            elif kind == OK:
+                seq, = SEQ_DATA.unpack(payload)
+                if seq in self.sentStates:
+                    self.agreed = (seq, self.sentStates[seq])
+            elif kind == RESYNC:
+                self.sendState(SEQ_DATA.unpack(payload)[0])
+            elif kind == STATE:
+                self.receiveState(payload)
+        while self.pending and self.held is None:
+            self.applyInput(*self.pending.pop(0))
+
+    # plays forward to the frame the input was made on, checks we agree on the state, then applies it
+    def applyInput(self, seq: int, checksum: int, kind: int, frame: int, data: bytes):
+        match = self.match
+        if match.world.frame > frame:
+            self.rollbacks += 1
+            match.restore(self.anchor)
+            if self.anchorInput is not None:
+                self.apply(*self.anchorInput)
+        # same order as the game loop: kickoff, or step
+        while match.world.frame < frame or match.readyForKickoff():
+            if match.readyForKickoff():
+                match.kickoff()
+            elif match.world.allAsleep(): # nothing happens but the count going up
+                match.world.frame = frame
+            else:
+                match.step()
+        packed = match.pack()
+        if zlib.crc32(packed) != checksum:
+            self.held = (seq, checksum, kind, frame, data)
+            self.resyncs += 1
+            self.client.send(RESYNC, SEQ_DATA.pack(seq))
+            return
+        self.agree(seq, packed)
+        self.apply(kind, frame, data)
+
+    def agree(self, seq: int, packed: bytes):
+        self.receivedStates[seq] = packed
+        self.receivedStates.pop(seq-KEPT_STATES, None)
+        self.client.send(OK, SEQ_DATA.pack(seq))
+
+    def remember(self, kind: int, frame: int, data: bytes):
+        self.match.snapshot(self.anchor)
+        self.anchorInput = (kind, frame, data)
+        self.inputFrame = frame
+
+    def apply(self, kind: int, frame: int, data: bytes):
+        match = self.match
+        self.remember(kind, frame, data)
+        self.applying = True
+        if kind == SHOT:
+            index, vx, vy = SHOT_DATA.unpack(data)
+            match.shoot(match.objects[index], (vx, vy))
+        elif kind == GRENADE_PLACED:
+            match.placeGrenade(*POWERUP_DATA.unpack(data))
+        elif kind == GLUE_PLACED:
+            match.placeGlue(*POWERUP_DATA.unpack(data))
+        self.applying = False
+
+    # the other side drifted: send the state an input was made in, as a difference from the last one we both checked
+    def sendState(self, seq: int):
+        packed = self.sentStates[seq]
+        base, basePacked = self.agreed
+        if base != NO_BASE and len(basePacked) == len(packed):
+            data = xorBytes(packed, basePacked) # mostly zeros, compresses to almost nothing
+        else:
+            base, data = NO_BASE, packed
+        self.client.send(STATE, STATE_DATA.pack(seq, base) + zlib.compress(data))
+
+    def receiveState(self, payload: bytes):
+        seq, base = STATE_DATA.unpack_from(payload)
+        packed = zlib.decompress(payload[STATE_DATA.size:])
+        if base != NO_BASE:
+            packed = xorBytes(packed, self.receivedStates[base])
+        self.match.unpack(packed)
+        held, self.held = self.held, None
+        self.agree(seq, packed)
+        self.apply(*held[2:])
+
+# pairs players up as they connect & passes each one's messages to the other, it never looks inside them
+class Relay:
+    def __init__(self):
+        self.waiting = None # (reader, writer) of a player without an opponent yet
+
+    async def handle(self, reader, writer):
+        noDelay(writer)
+        if self.waiting is None or self.waiting[1].is_closing():
+            self.waiting = (reader, writer)
+            return
+        opponent, self.waiting = self.waiting, None
+        for i, playerWriter in enumerate((opponent[1], writer)):
+            playerWriter.write(MESSAGE.pack(START, START_DATA.size) + START_DATA.pack(i))
+        await asyncio.gather(self.forward(opponent[0], writer), self.forward(reader, opponent[1]))
+
+    async def forward(self, reader, writer):
+        try:
+            while True:
+                message = await readMessage(reader)
+                if message is None:
+                    break
+                kind, payload = message
+                writer.write(MESSAGE.pack(kind, len(payload)) + payload)
+        finally:
+            writer.close()
+
+#  ---------------------- define functions
+async def readMessage(reader):
+    try:
+        kind, length = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+        return kind, await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+# inputs are tiny, send them straight away rather than waiting to fill a packet
+def noDelay(writer):
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+def xorBytes(a: bytes, b: bytes):
+    return np.bitwise_xor(np.frombuffer(a, np.uint8), np.frombuffer(b, np.uint8)).tobytes()
+
+async def serve(host: str, port: int, started=None):
+    relay = Relay()
+    server = await asyncio.start_server(relay.handle, host, port)
+    if started is not None:
+        started(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+# runs a relay on a background thread, returns the port it's listening on
+def serveInBackground(host="127.0.0.1", port=0):
+    ready = queue.Queue()
+    thread = threading.Thread(target=lambda: asyncio.run(serve(host, port, ready.put)), daemon=True)
+    thread.start()
+    return ready.get(timeout=5)
+
+# two headless players over localhost, each with its own match, stepped in turns like two game loops
+# corruptTurn nudges one side's ball on that turn, to check it gets put right
+def selftest(turns=20, corruptTurn=5, seed=0):
+    from batch import aimPolicy
+    port = serveInBackground()
+    players = []
+    for i in range(2):
+        client = Client("127.0.0.1", port)
+        client.connected.wait(5)
+        if client.error is not None:
+            raise SystemExit("couldn't connect: %s" % client.error)
+        players.append(NetMatch(client, Match()))
+    rng = np.random.default_rng(seed)
+
+    corrupted = False
+    frames = 0
+    while not all(player.started and (player.match.turns >= turns or player.match.win) and not player.pending and player.held is None for player in players):
+        frames += 1
+        if frames > 200000:
+            raise SystemExit("selftest stalled")
+        for player in players:
+            match = player.match
+            if match.readyForKickoff():
+                match.kickoff()
+                continue
+            player.poll()
+            if player.started and match.turn == player.color and match.turns < turns and not match.scored and not match.win and player.settled():
+                match.play(aimPolicy(match, rng))
+            if not corrupted and match.turns == corruptTurn and player is players[1]:
+                match.ball.x += 0.5
+                corrupted = True
+            if not player.paused():
+                match.step()
+
+    # play both to rest, then they should be identical
+    for player in players:
+        while not player.match.nothingMoving():
+            player.match.step()
+    blue, red = (player.match for player in sorted(players, key=lambda player: COLORS.index(player.color)))
+    frame = max(blue.world.frame, red.world.frame)
+    blue.world.frame = red.world.frame = frame # the side that waited stops counting sooner
+    same = blue.pack() == red.pack()
+    print("%d turns, score %d-%d, resyncs %d, rollbacks %d, in sync: %s" % (turns, blue.blueScore, blue.redScore,
+        sum(player.resyncs for player in players), sum(player.rollbacks for player in players), same))
+    for player in players:
+        player.client.close()
+    return same
+
+def main():
+    parser = argparse.ArgumentParser(description="Soccer online: the relay server, or a localhost self test.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serveCommand = commands.add_parser("serve", help="run the relay that pairs players up")
+    serveCommand.add_argument("--host", default="0.0.0.0")
+    serveCommand.add_argument("--port", type=int, default=PORT)
+    testCommand = commands.add_parser("selftest", help="play two headless players against each other over localhost")
+    testCommand.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.host, args.port, lambda port: print("listening on port %d" % port, file=sys.stderr)))
+    else:
+        sys.exit(0 if selftest(args.turns) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,740 @@
+import struct
+import numpy as np
+
+from constants import *
+
+# ---------------------- body kinds, stored in PhysicsWorld.kind
+KIND_BALL = 0
+KIND_PLAYER = 1
+
+MOVING_THRESHOLD = 0.001 # slower than this counts as stopped
+SLEEP_FRAMES = 30 # frames stopped & untouched before a body goes to sleep
+CONTACT_SLOP = 0.01 # overlap smaller than this doesn't count as touching
+FRICTION_CELL = 4 # pixels per friction field cell
+SOLVER_ITERATIONS = 2 # passes over the contacts each frame
+CONTACT_MARGIN = 1.0 # pairs this close are gathered too, pushing others apart can make them touch
+SWEEP_DEPTH = 0.5 # fast bodies stop this far into what they run into, so the contact solver sees the overlap
+SWEEP_DENSE = 4096 # up to this many fast body x body checks, sweep() does them all rather than asking a broad phase
+PARTICLE_CAPACITY = 64 # particle rows to start with, doubled whenever a spawn needs more
+EFFECTS = [] # every Effect ever made, a particle stores its effect's position in here
+
+# ---------------------- define classes
+# sweep and prune on x: finds pairs of bodies whose bounding boxes overlap
+# sorting is O(n log n) and the pairs come out in bulk, so cost grows with the number of near pairs, not n squared
+class BroadPhase:
+    def __init__(self, margin=0.0):
+        self.margin = margin # extra room around each box, so pairs stay valid a little while after update()
+        self.order = np.zeros(0, dtype=np.intp)
+        self.lo = np.zeros(0) # sorted left edges
+        self.hi = np.zeros(0) # right edges, in the same order
+        self.pos = np.zeros((0, 2))
+        self.size = np.zeros(0)
+
+    def update(self, pos: np.ndarray, size: np.ndarray):
+        self.pos = pos
+        self.size = size + self.margin
+        lo = pos[:, 0] - self.size
+        self.order = np.argsort(lo, kind="stable")
+        self.lo = lo[self.order]
+        self.hi = (pos[:, 0] + self.size)[self.order]
+
+    # candidate pairs (i, j), i < j, sorted the same way as looping i then j over the bodies
+    def pairs(self):
+        n = len(self.order)
+        if n < 2:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        # everything that starts before box k ends overlaps it on x
+        ends = np.searchsorted(self.lo, self.hi, side="right")
+        counts = ends - np.arange(n) - 1
+        total = counts.sum()
+        first = np.repeat(np.arange(n), counts)
+        second = first + 1 + np.arange(total) - np.repeat(np.cumsum(counts)-counts, counts)
+        a, b = self.order[first], self.order[second]
+
+        # then check y
+        keep = np.abs(self.pos[a, 1] - self.pos[b, 1]) <= self.size[a] + self.size[b]
+        a, b = a[keep], b[keep]
+        i, j = np.minimum(a, b), np.maximum(a, b)
+        sort = np.lexsort((j, i))
+        return i[sort], j[sort]
+
+    # indices of bodies whose box overlaps the circle's box
+    def query(self, x: float, y: float, radius: float):
+        stop = np.searchsorted(self.lo, x + radius, side="right") # boxes starting further right can't overlap
+        candidates = self.order[:stop]
+        near = (self.pos[candidates, 0] + self.size[candidates] >= x - radius) & \
+            (np.abs(self.pos[candidates, 1] - y) <= self.size[candidates] + radius)
+        return np.sort(candidates[near])
+
+# where the glue is: distance from each cell of a coarse grid to the nearest glue centre
+# updated when a glue is placed or runs out, then every body is looked up at once
+class FrictionField:
+    def __init__(self, width: int, height: int, radius=GLUE_SIZE, cell=FRICTION_CELL):
+        self.width, self.height = width, height
+        self.radius = radius # of each glue zone
+        self.cell = cell
+        self.cols = int(np.ceil(width/cell)) + 1
+        self.rows = int(np.ceil(height/cell)) + 1
+        # grid points sit on multiples of cell, so a position maps straight onto them
+        self.gridX = np.arange(self.cols, dtype=np.float64)[None, :]*cell
+        self.gridY = np.arange(self.rows, dtype=np.float64)[:, None]*cell
+        self.nearest = np.full((self.rows, self.cols), np.inf)
+        self.zones = [] # glue centres
+
+    def add(self, x: float, y: float):
+        self.zones.append((x, y))
+        np.minimum(self.nearest, np.hypot(self.gridX-x, self.gridY-y), out=self.nearest)
+
+    # removing can't be undone from the minimum, so rebuild from the zones left (rare, a few times a game)
+    def remove(self, x: float, y: float):
+        self.zones.remove((x, y))
+        self.nearest.fill(np.inf)
+        for zx, zy in self.zones:
+            np.minimum(self.nearest, np.hypot(self.gridX-zx, self.gridY-zy), out=self.nearest)
+
+    def clear(self):
+        self.zones = []
+        self.nearest.fill(np.inf)
+
+    # whether each circle overlaps a glue zone, the distance is interpolated between grid points
+    def inZone(self, pos: np.ndarray, size: np.ndarray):
+        if not self.zones:
+            return np.zeros(len(size), dtype=bool)
+        gx = np.clip(pos[:, 0]/self.cell, 0, self.cols-1.001)
+        gy = np.clip(pos[:, 1]/self.cell, 0, self.rows-1.001)
+        col, row = gx.astype(np.intp), gy.astype(np.intp)
+        fx, fy = gx-col, gy-row
+        near = self.nearest.ravel()
+        i = row*self.cols + col # top left grid point
+        top = near[i] + (near[i+1]-near[i])*fx
+        bottom = near[i+self.cols] + (near[i+self.cols+1]-near[i+self.cols])*fx
+        return top + (bottom-top)*fy <= self.radius + size
+
+# resolves every contact of a frame together (based on the old handleCollision, thanks Alex)
+# contacts are gathered into arrays, then split into batches where no body appears twice
+# each batch is solved in one vectorized go, in an order that gives the same result as one contact at a time
+# over the gathered pairs; a push can bring a pair that wasn't gathered together, missed() finds those afterwards
+class ContactSolver:
+    def __init__(self, iterations=SOLVER_ITERATIONS, margin=CONTACT_MARGIN):
+        self.iterations = iterations
+        self.margin = margin
+        self.first = np.zeros(0, dtype=np.intp) # contact k is between first[k] & second[k], sorted like the pairs
+        self.second = np.zeros(0, dtype=np.intp)
+        self.batches = [] # (first, second, contact numbers) of each batch
+        self.passes = [] # (positions as it began, where first & second were after each contact) for each pass of solve()
+        self.reach = BroadPhase() # for missed()
+
+    # keeps the candidate pairs that are touching (or nearly), and batches them
+    def gather(self, world, first: np.ndarray, second: np.ndarray):
+        delta = world.pos[first] - world.pos[second]
+        reach = world.size[first] + world.size[second] + self.margin
+        near = (delta*delta).sum(axis=1) <= reach*reach
+        self.first, self.second = first[near], second[near]
+        self.batches = batchContacts(self.first, self.second, world.count)
+
+    # gathers more pairs (none already gathered), keeping them in order
+    def add(self, world, first: np.ndarray, second: np.ndarray):
+        n = world.count
+        keys = np.sort(np.concatenate((self.first*n + self.second, first*n + second)))
+        self.first, self.second = keys//n, keys%n
+        self.batches = batchContacts(self.first, self.second, n)
+
+    def solve(self, world):
+        self.passes = []
+        for i in range(self.iterations):
+            began = world.pos[:world.count].copy()
+            after = np.empty((len(self.first), 2, 2))
+            for first, second, contacts in self.batches:
+                self._solveBatch(world, first, second)
+                after[contacts, 0] = world.pos[first]
+                after[contacts, 1] = world.pos[second]
+            self.passes.append((began, after))
+
+    # pairs left out by gather() that would have touched in the last solve(), done one contact at a time
+    # every pair gets a turn each pass, in order, & finds its bodies where their last contacts before it left them
+    def missed(self, world, awake: np.ndarray):
+        n, count = world.count, len(self.first)
+        start = self.passes[0][0]
+        bodies = np.concatenate((self.first, self.second))
+        travel = np.zeros(n) # furthest each body got from its start
+        for began, after in self.passes:
+            away = np.concatenate((after[:, 0], after[:, 1])) - start[bodies]
+            np.maximum.at(travel, bodies, np.sqrt((away*away).sum(axis=1)))
+        none = np.zeros(0, dtype=np.intp)
+        if travel.max(initial=0)*2 <= self.margin:
+            return none, none # ungathered pairs started further apart than that
+
+        # pairs that started close enough to have met, that two sleeping bodies aren't alone in & weren't gathered
+        self.reach.update(start, world.size[:n] + travel)
+        first, second = self.reach.pairs()
+        delta = start[first] - start[second]
+        reach = world.size[first] + world.size[second] + travel[first] + travel[second]
+        keep = ((delta*delta).sum(axis=1) <= reach*reach) & (awake[first] | awake[second])
+        first, second = first[keep], second[keep]
+        keys = first*n + second
+        gathered = np.append(self.first*n + self.second, -1) # -1 for keys past the end to land on
+        turn = np.searchsorted(gathered[:-1], keys) # contacts before the pair's turn
+        keep = gathered[turn] != keys
+        first, second, turn = first[keep], second[keep], turn[keep]
+        if not len(first):
+            return none, none
+
+        # each body's contacts in order, the last one before the pair's turn says where the body was
+        rows = np.concatenate((np.arange(count), np.arange(count))) # side*count + contact, like bodies
+        order = np.lexsort((rows, bodies))
+        slots = bodies[order]*(count + 1) + rows[order]
+        spots = []
+        for body in (first, second):
+            last = np.searchsorted(slots, body*(count + 1) + turn) - 1
+            row = order[np.maximum(last, 0)]
+            spots.append((body, (last >= 0) & (bodies[row] == body), row % count, row // count))
+        touched = np.zeros(len(first), dtype=bool)
+        for began, after in self.passes:
+            a, b = (np.where(found[:, None], after[contact, side], began[body]) for body, found, contact, side in spots)
+            delta = a - b
+            touched |= world.size[first] + world.size[second] - np.sqrt((delta*delta).sum(axis=1)) > 0
+        return first[touched], second[touched]
+
+    # the contacts in a batch share no bodies, so plain fancy indexing can write them all back
+    def _solveBatch(self, world, a: np.ndarray, b: np.ndarray):
+        pos, vel = world.pos, world.vel
+
+        # Calculate the vector between the objects, & overlap
+        delta = pos[a] - pos[b]
+        distance = np.sqrt((delta*delta).sum(axis=1))
+        overlap = world.size[a] + world.size[b] - distance
+        hit = overlap > 0
+        if not hit.any():
+            return
+        a, b, delta, distance, overlap = a[hit], b[hit], delta[hit], distance[hit], overlap[hit]
+        world.awake[a] = True
+        world.awake[b] = True
+        deep = overlap > CONTACT_SLOP # keeps them both awake
+        world.touching[a[deep]] = True
+        world.touching[b[deep]] = True
+
+        # Normalize the delta vector (exactly on top of each other: push apart sideways)
+        stacked = distance == 0
+        distance[stacked] = 1
+        delta[stacked] = (1, 0)
+        normal = delta / distance[:, None]
+
+        # Separate the objects
+        separation = normal * (overlap*0.5)[:, None]
+        pos[a] += separation
+        pos[b] -= separation
+
+        # Calculate velocity along the normal, do not resolve if velocities are separating
+        relativeVelocity = vel[a] - vel[b]
+        velocityAlongNormal = (relativeVelocity*normal).sum(axis=1)
+        closing = velocityAlongNormal <= 0
+        if not closing.any():
+            return
+        a, b, normal, relativeVelocity, velocityAlongNormal = a[closing], b[closing], normal[closing], relativeVelocity[closing], velocityAlongNormal[closing]
+        inverseA, inverseB = 1/world.mass[a], 1/world.mass[b]
+        inverseSum = inverseA + inverseB
+
+        # Calculate impulse
+        impulse = normal * (-(1 + world.restitution) * velocityAlongNormal / inverseSum)[:, None]
+
+        # Calculate friction, it's always applied against the tangent
+        tangent = np.stack((-normal[:, 1], normal[:, 0]), axis=1)
+        frictionScalar = (relativeVelocity*tangent).sum(axis=1) * world.frictionCoefficient / inverseSum
+        frictionImpulse = tangent * -np.abs(frictionScalar)[:, None]
+
+        # Apply both, limiting velocities to maxVel
+        total = impulse + frictionImpulse
+        vel[a] = np.clip(vel[a] + total*inverseA[:, None], -world.maxVel, world.maxVel)
+        vel[b] = np.clip(vel[b] - total*inverseB[:, None], -world.maxVel, world.maxVel)
+
+# how one kind of particle burst looks & behaves
+# make them at import time (like GRENADE_EFFECT), so effect codes are the same in every process
+class Effect:
+    def __init__(self, count: int, speed: float, mass: float, size: float, lifetime: int, color: tuple):
+        self.count = count # particles per burst, spread evenly all around
+        self.speed = speed
+        self.mass = mass
+        self.size = size # radius
+        self.lifetime = lifetime # frames
+        self.color = color
+        self.code = len(EFFECTS)
+        EFFECTS.append(self)
+
+# short-lived particles (grenade fragments), kept apart from the bodies in their own pool of arrays
+# they push bodies but not each other and run out after a number of frames, so hundreds of them cost little
+# rows 0 to count-1 are live, expired ones are swapped out for the last live ones
+class Particles:
+    def __init__(self, capacity=PARTICLE_CAPACITY):
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float64)
+        self.vel = np.zeros((capacity, 2), dtype=np.float64)
+        self.mass = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self.expire = np.zeros(capacity, dtype=np.int32) # last frame alive
+        self.effect = np.zeros(capacity, dtype=np.int16) # code of the Effect it came from
+
+    ARRAYS = ("pos", "vel", "mass", "size", "expire", "effect")
+
+    def reserve(self, count: int):
+        capacity = len(self.mass)
+        if count <= capacity:
+            return
+        while capacity < count:
+            capacity *= 2
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    # a burst of effect.count particles from (x, y), speed overrides the effect's (for tuning)
+    def spawn(self, effect: Effect, x: float, y: float, frame: int, speed=None):
+        n, k = self.count, effect.count
+        self.reserve(n + k)
+        rows = slice(n, n + k)
+        directions = np.pi*np.arange(k)/(k/2)
+        self.pos[rows] = x, y
+        self.vel[rows] = np.stack((np.cos(directions), np.sin(directions)), axis=1)*(effect.speed if speed is None else speed)
+        self.mass[rows] = effect.mass
+        self.size[rows] = effect.size
+        self.expire[rows] = frame + effect.lifetime
+        self.effect[rows] = effect.code
+        self.count = n + k
+
+    def clear(self):
+        self.count = 0
+
+    # one frame, call after the bodies have moved & the frame count has gone up
+    # expired particles go first, then the rest bounce off the walls, move, hit bodies & slow down
+    def step(self, world):
+        self.removeExpired(world.frame)
+        n = self.count
+        if not n:
+            return
+        pos, vel, size = self.pos[:n], self.vel[:n], self.size[:n]
+        bounceOffWalls(world, pos, vel, size)
+        self.hitBodies(world)
+        inGlue = world.frictionField.inZone(pos, size)
+        vel *= np.where(inGlue, world.glueFriction, world.friction)[:, None]
+
+    # swap remove: live rows from the end fill the holes the expired ones leave
+    def removeExpired(self, frame: int):
+        n = self.count
+        expired = self.expire[:n] < frame
+        if not expired.any():
+            return
+        live = n - int(expired.sum())
+        holes = np.flatnonzero(expired[:live])
+        movers = live + np.flatnonzero(~expired[live:n])
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            array[holes] = array[movers]
+        self.count = live
+
+    # moves every particle by its velocity, stopping at the first body in its way (each bounces off at most one a frame)
+    # bodies get the other half of the impulse & are woken, they're never pushed apart from a particle, it's too small to matter
+    def hitBodies(self, world):
+        n, m = self.count, world.count
+        pos, vel, size, mass = self.pos[:n], self.vel[:n], self.size[:n], self.mass[:n]
+        near = np.zeros(0, dtype=np.intp)
+        if m:
+            # only bodies near where the particles are this frame
+            lo = np.minimum(pos, pos + vel).min(axis=0) - size.max()
+            hi = np.maximum(pos, pos + vel).max(axis=0) + size.max()
+            bodyPos, bodySize = world.pos[:m], world.size[:m]
+            near = np.flatnonzero(((bodyPos + bodySize[:, None] >= lo) & (bodyPos - bodySize[:, None] <= hi)).all(axis=1))
+        if not len(near):
+            pos += vel
+            return
+
+        delta = pos[:, None] - world.pos[near][None]
+        reach = size[:, None] + world.size[near][None]
+        toi = timeOfImpact(delta, vel[:, None], reach)
+        toi[(delta*delta).sum(axis=2) < reach*reach] = 0 # already touching
+        first = toi.argmin(axis=1)
+        when = toi[np.arange(n), first]
+        hit = np.flatnonzero(when < 1)
+        pos += vel*when[:, None]
+        if len(hit):
+            body = near[first[hit]]
+            normal = pos[hit] - world.pos[body]
+            distance = np.sqrt((normal*normal).sum(axis=1))
+            distance[distance == 0] = 1
+            normal /= distance[:, None]
+            pos[hit] = world.pos[body] + normal*(size[hit] + world.size[body])[:, None] # on the surface
+
+            velocityAlongNormal = ((vel[hit] - world.vel[body])*normal).sum(axis=1)
+            closing = velocityAlongNormal < 0
+            hit, body, normal, velocityAlongNormal = hit[closing], body[closing], normal[closing], velocityAlongNormal[closing]
+            inverseParticle, inverseBody = 1/mass[hit], 1/world.mass[body]
+            impulse = normal*(-(1 + world.restitution)*velocityAlongNormal/(inverseParticle + inverseBody))[:, None]
+            vel[hit] += impulse*inverseParticle[:, None]
+            kick = np.zeros((m, 2))
+            np.add.at(kick, body, -impulse*inverseBody[:, None]) # several particles can hit the same body
+            touched = np.unique(body)
+            world.vel[touched] = np.clip(world.vel[touched] + kick[touched], -world.maxVel, world.maxVel)
+            world.awake[touched] = True
+            world.restFrames[touched] = 0
+            world.touching[touched] = True
+        pos += vel*(1 - when)[:, None] # the rest of the frame, after any bounce
+
+    # copies the live particles into another pool, reusing its arrays
+    def copyInto(self, other):
+        n = self.count
+        other.count = 0
+        other.reserve(n)
+        for name in self.ARRAYS:
+            getattr(other, name)[:n] = getattr(self, name)[:n]
+        other.count = n
+        return other
+
+    def pack(self):
+        n = self.count
+        return struct.pack("<I", n) + b"".join(getattr(self, name)[:n].tobytes() for name in self.ARRAYS)
+
+    # returns the offset after the pack() bytes
+    def unpack(self, data, offset=0):
+        n, = struct.unpack_from("<I", data, offset)
+        offset += 4
+        self.count = 0
+        self.reserve(n)
+        for name in self.ARRAYS:
+            rows = getattr(self, name)[:n]
+            rows[...] = np.frombuffer(data, rows.dtype, rows.size, offset).reshape(rows.shape)
+            offset += rows.nbytes
+        self.count = n
+        return offset
+
+# holds every body's state in contiguous arrays (structure of arrays)
+# row i of each array belongs to bodies[i], the view object for that body
+class PhysicsWorld:
+    def __init__(self, capacity=32):
+        self.count = 0
+        self.pos = np.zeros((capacity, 2), dtype=np.float64)
+        self.vel = np.zeros((capacity, 2), dtype=np.float64)
+        self.mass = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.float64) # radius of circle
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.moving = np.zeros(capacity, dtype=bool)
+        # sleeping bodies are skipped until something wakes them (see wake())
+        self.awake = np.zeros(capacity, dtype=bool)
+        self.restFrames = np.zeros(capacity, dtype=np.int32) # frames in a row stopped & untouched
+        self.touching = np.zeros(capacity, dtype=bool) # overlapped something this frame
+        self.bodies = [] # kept in place (never reassigned) so callers can hold on to it
+        self.frame = 0 # frames stepped, the world's only clock
+        self.broadPhase = BroadPhase()
+        self.sweepPhase = BroadPhase() # over where bodies go this frame, for sweep()
+        self.frictionField = FrictionField(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.solver = ContactSolver()
+        self.pairCount = 0 # candidate pairs in the last collide()
+        self.particles = Particles() # stepped with the bodies, see step()
+
+        # field geometry
+        self.left = X_GAP
+        self.top = Y_GAP
+        self.right = X_GAP + FIELD_WIDTH
+        self.bottom = Y_GAP + FIELD_HEIGHT
+        self.goalTop = GOAL_TOP
+        self.goalBottom = GOAL_BOTTOM
+        self.leftGoalBack = LEFT_GOAL_BACK
+        self.rightGoalBack = RIGHT_GOAL_BACK
+
+        # tuning
+        self.friction = FRICTION
+        self.glueFriction = GLUE_FRICTION
+        self.restitution = RESTITUTION
+        self.frictionCoefficient = FRICTION_COEFFICIENT
+        self.maxVel = MAX_VEL
+
+    ARRAYS = ("pos", "vel", "mass", "size", "kind", "moving", "awake", "restFrames", "touching")
+    FIELD = ("left", "top", "right", "bottom", "goalTop", "goalBottom", "leftGoalBack", "rightGoalBack")
+    SETTINGS = FIELD + ("friction", "glueFriction", "restitution", "frictionCoefficient", "maxVel")
+
+    def _grow(self):
+        capacity = len(self.mass)*2
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    # adds a body's row, returns its index
+    def add(self, body, x: float, y: float, mass: float, size: float, kind: int):
+        if self.count == len(self.mass):
+            self._grow()
+        i = self.count
+        self.pos[i] = x, y
+        self.vel[i] = 0
+        self.mass[i] = mass
+        self.size[i] = size
+        self.kind[i] = kind
+        self.moving[i] = False
+        self.awake[i] = True
+        self.restFrames[i] = 0
+        self.touching[i] = False
+        self.bodies.append(body)
+        self.count += 1
+        return i
+
+    # removes a body by moving the last row into its place, O(1)
+    def remove(self, body):
+        i, last = body.index, self.count-1
+        if i != last:
+            for name in self.ARRAYS:
+                arr = getattr(self, name)
+                arr[i] = arr[last]
+            moved = self.bodies[last]
+            moved.index = i
+            self.bodies[i] = moved
+        self.bodies.pop()
+        self.count -= 1
+        body.index = -1
+
+    def clear(self):
+        for body in self.bodies:
+            body.index = -1
+        self.bodies.clear()
+        self.count = 0
+        self.particles.clear()
+
+    # copies every body's state, the particles, the glue & the settings into another world, for stepping it ahead without touching this one
+    # the copy gets no view objects, and reuses its arrays when they're big enough
+    def copyInto(self, other):
+        n = self.count
+        if len(other.mass) < n:
+            other.count = 0
+            while len(other.mass) < n:
+                other._grow()
+        for name in self.ARRAYS:
+            getattr(other, name)[:n] = getattr(self, name)[:n]
+        for name in self.SETTINGS:
+            setattr(other, name, getattr(self, name))
+        other.count = n
+        other.frame = self.frame
+        other.bodies.clear()
+        self.particles.copyInto(other.particles)
+        if other.frictionField.nearest.shape != self.frictionField.nearest.shape: # a different size of arena
+            other.frictionField = FrictionField(self.frictionField.width, self.frictionField.height)
+        other.frictionField.zones = list(self.frictionField.zones)
+        np.copyto(other.frictionField.nearest, self.frictionField.nearest)
+        return other
+
+    # every body's & particle's state as bytes (not the views or settings), see unpack()
+    def pack(self):
+        n = self.count
+        return (struct.pack("<II", self.frame, n) + b"".join(getattr(self, name)[:n].tobytes() for name in self.ARRAYS)
+                + self.particles.pack())
+
+    # loads pack() bytes into rows that already exist (add the views first), returns the offset after them
+    def unpack(self, data, offset=0):
+        frame, n = struct.unpack_from("<II", data, offset)
+        if n != self.count:
+            raise ValueError("packed world has %d bodies, this one has %d" % (n, self.count))
+        offset += 8
+        for name in self.ARRAYS:
+            rows = getattr(self, name)[:n]
+            rows[...] = np.frombuffer(data, rows.dtype, rows.size, offset).reshape(rows.shape)
+            offset += rows.nbytes
+        self.frame = frame
+        return self.particles.unpack(data, offset)
+
+    # takes the field & goal walls from an Arena (see game.py), the glue grid covers its window
+    def setField(self, arena):
+        for name in self.FIELD:
+            setattr(self, name, getattr(arena, name))
+        self.frictionField = FrictionField(arena.width, arena.height)
+
+    # pairs of bodies that might be touching, from the broad phase
+    def candidatePairs(self):
+        n = self.count
+        self.broadPhase.update(self.pos[:n], self.size[:n])
+        return self.broadPhase.pairs()
+
+    # resolves collisions between bodies, sleeping pairs are left alone
+    # the same as solving every pair one at a time: pairs the solver missed are gathered & it starts over
+    def collide(self):
+        n = self.count
+        first, second = self.candidatePairs()
+        self.pairCount = len(first)
+        awake = self.awake[first] | self.awake[second] # two sleeping bodies can't be pushing each other
+        self.solver.gather(self, first[awake], second[awake])
+        start = (self.pos[:n].copy(), self.vel[:n].copy(), self.awake[:n].copy(), self.touching[:n].copy())
+        while True:
+            self.solver.solve(self)
+            first, second = self.solver.missed(self, start[2])
+            if not len(first):
+                return
+            self.pos[:n], self.vel[:n], self.awake[:n], self.touching[:n] = start
+            self.solver.add(self, first, second)
+
+    # bodies that might be inside the circle, uses the positions from the last candidatePairs()
+    def query(self, x: float, y: float, radius: float):
+        return self.broadPhase.query(x, y, radius)
+
+    def anyMoving(self):
+        return bool(self.moving[:self.count].any()) or self.particles.count > 0
+
+    # particles never sleep, they run out
+    def allAsleep(self):
+        return not self.awake[:self.count].any() and self.particles.count == 0
+
+    # something pushed the body, it takes part in the simulation again
+    def wake(self, i: int):
+        self.awake[i] = True
+
+    # puts bodies that have been stopped & untouched for SLEEP_FRAMES to sleep, call after collisions
+    def updateSleep(self):
+        n = self.count
+        resting = ~(self.moving[:n] | self.touching[:n])
+        self.restFrames[:n] = np.where(resting, np.minimum(self.restFrames[:n]+1, SLEEP_FRAMES), 0)
+        sleepy = self.awake[:n] & (self.restFrames[:n] >= SLEEP_FRAMES)
+        self.vel[:n][sleepy] = 0
+        self.awake[:n] &= ~sleepy
+        self.touching[:n] = False
+
+    # one frame of simulation for every body: walls, then movement & friction, then the particles
+    # sleeping bodies don't move, so when everything is asleep there's nothing to do
+    def step(self):
+        if self.allAsleep():
+            self.frame += 1
+            return
+        self.wallCollisions()
+        self.integrate()
+        self.frame += 1
+        self.particles.step(self)
+
+    # reflects bodies off the field and goal walls
+    def wallCollisions(self):
+        n = self.count
+        bounceOffWalls(self, self.pos[:n], self.vel[:n], self.size[:n])
+
+    # moves every body by its velocity, then applies friction (more of it in glue)
+    # fast bodies only go as far as the first thing in their way, and bounce off goal posts
+    def integrate(self):
+        n = self.count
+        pos, vel = self.pos[:n], self.vel[:n]
+        fast, advance, post = self.sweep()
+        pos += vel
+        if len(fast):
+            pos[fast] -= vel[fast]*(1-advance)[:, None]
+            bounced = fast[post >= 0]
+            if len(bounced):
+                normal = (pos[bounced] - self.posts()[post[post >= 0]]) / self.size[bounced, None]
+                vel[bounced] -= 2*(vel[bounced]*normal).sum(axis=1)[:, None]*normal
+
+        inGlue = self.frictionField.inZone(pos, self.size[:n])
+        friction = np.where(inGlue, self.glueFriction, self.friction)
+        vel *= friction[:, None]
+
+        self.moving[:n] = (vel*vel).sum(axis=1) > MOVING_THRESHOLD**2
+
+    # the corners of the goal mouths, the only wall points a fast body can slip past
+    def posts(self):
+        return np.array(((self.left, self.goalTop), (self.left, self.goalBottom),
+                         (self.right, self.goalTop), (self.right, self.goalBottom)))
+
+    # continuous collision for bodies moving further than their radius in a frame, everything else can't tunnel
+    # returns the fast bodies, how much of their move they can make (0 to 1),
+    # and the goal post each one stops at (-1 when it's a body or nothing)
+    def sweep(self):
+        n = self.count
+        pos, vel, size = self.pos[:n], self.vel[:n], self.size[:n]
+        isFast = (vel*vel).sum(axis=1) > size*size
+        fast = np.flatnonzero(isFast)
+        if not len(fast):
+            return fast, np.zeros(0), fast
+        # every body moves in a straight line this frame, so each fast one is checked against every body's path
+        if len(fast)*n <= SWEEP_DENSE:
+            delta = pos[fast, None] - pos[None]
+            toi = timeOfImpact(delta, vel[fast, None] - vel[None], size[fast, None] + size[None] - SWEEP_DEPTH)
+            toi[np.arange(len(fast)), fast] = 1 # not against itself
+            advance = toi.min(axis=1)
+        else: # lots of them: only bodies whose paths' boxes overlap can meet, the rest would come out as 1 anyway
+            self.sweepPhase.update(pos + vel/2, size + np.abs(vel).max(axis=1)/2)
+            first, second = self.sweepPhase.pairs()
+            either = isFast[first] | isFast[second]
+            first, second = first[either], second[either]
+            toi = timeOfImpact(pos[first] - pos[second], vel[first] - vel[second], size[first] + size[second] - SWEEP_DEPTH)
+            soonest = np.ones(n)
+            np.minimum.at(soonest, first, toi) # a pair of fast bodies counts for both, same as the other way round
+            np.minimum.at(soonest, second, toi)
+            advance = soonest[fast]
+
+        postToi = timeOfImpact(pos[fast, None] - self.posts()[None], vel[fast, None], size[fast, None])
+        post = postToi.argmin(axis=1)
+        postFirst = postToi[np.arange(len(fast)), post]
+        hitPost = postFirst < advance
+        advance[hitPost] = postFirst[hitPost]
+        return fast, advance, np.where(hitPost, post, -1)
+
+GRENADE_EFFECT = Effect(FRAG_COUNT, FRAG_VEL, FRAG_MASS, FRAG_SIZE, FRAG_LIFETIME, BLACK)
+
+#  ---------------------- define functions
+# reflects circles (rows of pos, vel & size) off the walls of the world's field and goals
+# each check sees the result of the previous one, same as checking them one object at a time
+def bounceOffWalls(world: PhysicsWorld, pos: np.ndarray, vel: np.ndarray, r: np.ndarray):
+    x, y = pos[:, 0], pos[:, 1]
+    vx, vy = vel[:, 0], vel[:, 1]
+
+    # field walls
+    hit = y-r < world.top # top
+    vy[hit] = -vy[hit]
+    y[hit] = world.top + r[hit]
+    hit = y+r > world.bottom # bottom
+    vy[hit] = -vy[hit]
+    y[hit] = world.bottom - r[hit]
+    # take into account the goal for left/right
+    outsideGoal = (y-r < world.goalTop) | (y+r > world.goalBottom)
+    hit = outsideGoal & (x-r < world.left) # left
+    vx[hit] = -vx[hit]
+    x[hit] = world.left + r[hit]
+    hit = outsideGoal & (x+r > world.right) # right
+    vx[hit] = -vx[hit]
+    x[hit] = world.right - r[hit]
+
+    # goal walls
+    hit = x-r < world.leftGoalBack # left goal back
+    vx[hit] = -vx[hit]
+    x[hit] = world.leftGoalBack + r[hit]
+    hit = x+r > world.rightGoalBack # right goal back
+    vx[hit] = -vx[hit]
+    x[hit] = world.rightGoalBack - r[hit]
+    # take into account object has to be inside goal
+    insideGoal = (x < world.left) | (x > world.right)
+    hit = insideGoal & (y-r < world.goalTop) # goal top
+    vy[hit] = -vy[hit]
+    y[hit] = world.goalTop + r[hit]
+    hit = insideGoal & (y+r > world.goalBottom) # goal bottom
+    vy[hit] = -vy[hit]
+    y[hit] = world.goalBottom - r[hit]
+
+# when (0 to 1 of the frame) circles at delta apart, closing at dv, first get within reach, 1 if they don't
+# circles already within reach are left to the contact solver
+def timeOfImpact(delta: np.ndarray, dv: np.ndarray, reach: np.ndarray):
+    a = (dv*dv).sum(axis=-1)
+    b = (delta*dv).sum(axis=-1)
+    c = (delta*delta).sum(axis=-1) - reach*reach
+    a, b, c = np.broadcast_arrays(a, b, c)
+    disc = b*b - a*c
+    hit = (c > 0) & (b < 0) & (disc >= 0) # apart, closing, and the paths come close enough
+    toi = np.ones(c.shape)
+    toi[hit] = (-b[hit] - np.sqrt(disc[hit])) / a[hit]
+    return np.minimum(toi, 1)
+
+# splits contacts into batches that share no bodies
+# contact k goes in a batch after every earlier contact that shares a body with it
+def batchContacts(first: np.ndarray, second: np.ndarray, bodies: int):
+    batches = []
+    remaining = np.arange(len(first))
+    earliest = np.empty(bodies, dtype=np.intp)
+    while len(remaining):
+        a, b = first[remaining], second[remaining]
+        # the earliest remaining contact for each body
+        earliest.fill(len(first))
+        np.minimum.at(earliest, a, remaining)
+        np.minimum.at(earliest, b, remaining)
+        ready = (earliest[a] == remaining) & (earliest[b] == remaining)
+        batches.append((a[ready], b[ready], remaining[ready]))
+        remaining = remaining[~ready]
+    return batches
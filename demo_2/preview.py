@@ -0,0 +1,85 @@
+import pygame
+import numpy as np
+
+from constants import *
+from physics import PhysicsWorld
+
+# predicts where a shot sends the shooter, the ball & whatever they hit, while the player aims
+
+# ---------------------- define constants
+PREVIEW_FRAMES = FPS*3 # how far ahead the path goes
+PREVIEW_STEPS = 15 # frames predicted per real frame (a few ms), so a new aim takes a few frames to fill in
+PREVIEW_SAMPLE = 3 # a path point every this many predicted frames
+PREVIEW_ITERATIONS = 1 # contact solver passes, fewer than the real game, it's only a guide
+PREVIEW_WIDTH = 2
+PREVIEW_MIN_TRAVEL = 1 # bodies that move less than this get no path
+
+# ---------------------- define classes
+# steps a scratch copy of the world forward, a few frames at a time, from the moment the shot is taken
+# the prediction is kept until the aim or the glue changes, so holding the mouse still costs nothing
+class ShotPreview:
+    def __init__(self, frames=PREVIEW_FRAMES, steps=PREVIEW_STEPS):
+        self.frames = frames
+        self.steps = steps
+        self.world = PhysicsWorld()
+        self.world.solver.iterations = PREVIEW_ITERATIONS
+        self.key = None
+        self.predicted = 0 # frames predicted so far for this key
+        self.done = True
+        self.samples = [] # positions of every body, one array per sample
+        self.colors = []
+        self.paths = [] # (color, points) for every body that moved
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+    # call every frame while aiming, restarts the prediction if the shot changed, else refines it
+    # glue that runs out when the shot is taken (lifetime 1) is left out, like in the AI's rollouts
+    def update(self, world: PhysicsWorld, glues: list, colors: list, index: int, vel):
+        expiring = [(glue.x, glue.y) for glue in glues if glue.lifetime == 1]
+        key = (index, float(vel[0]), float(vel[1]), tuple(world.frictionField.zones), tuple(expiring))
+        if key != self.key:
+            self.key = key
+            world.copyInto(self.world)
+            for x, y in expiring:
+                self.world.frictionField.remove(x, y)
+            self.world.vel[index] = vel
+            self.world.wake(index)
+            self.colors = colors
+            self.predicted = 0
+            self.done = False
+            self.samples = [self.world.pos[:self.world.count].copy()]
+        if not self.done:
+            self.refine()
+
+    # predicts the next few frames, then rebuilds the paths from the samples so far
+    def refine(self):
+        world = self.world
+        for i in range(self.steps):
+            world.step()
+            if not world.allAsleep():
+                world.collide()
+                world.updateSleep()
+            self.predicted += 1
+            stopped = world.allAsleep() or not world.anyMoving()
+            if self.predicted % PREVIEW_SAMPLE == 0 or stopped:
+                self.samples.append(world.pos[:world.count].copy())
+            if stopped or self.predicted >= self.frames:
+                self.done = True
+                break
+
+        points = np.stack(self.samples, axis=1) # body, sample, xy
+        travel = (points.max(axis=1) - points.min(axis=1)).max(axis=1)
+        moved = np.flatnonzero(travel >= PREVIEW_MIN_TRAVEL)
+        self.paths = [(self.colors[i], points[i].tolist()) for i in moved]
+        if len(moved):
+            lo, hi = np.floor(points[moved].min(axis=(0, 1))), np.ceil(points[moved].max(axis=(0, 1)))
+            self.rect = pygame.Rect(int(lo[0]), int(lo[1]), int(hi[0]-lo[0]) + 1, int(hi[1]-lo[1]) + 1).inflate(PREVIEW_WIDTH*2, PREVIEW_WIDTH*2)
+        else:
+            self.rect = pygame.Rect(0, 0, 0, 0)
+
+    # changes whenever the drawn paths do
+    def signature(self):
+        return (self.key, len(self.samples))
+
+    def draw(self, surf: pygame.Surface):
+        for color, points in self.paths:
+            pygame.draw.lines(surf, color, False, points, PREVIEW_WIDTH)
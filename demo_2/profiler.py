@@ -0,0 +1,166 @@
+import json, time, atexit
+import pygame
+import numpy as np
+
+from constants import *
+from assets import assets
+
+# times the phases of every game frame, to find what blew the frame budget
+# F3 shows an overlay of rolling averages & p99s, --trace FILE saves the last few minutes of frames for chrome://tracing (or ui.perfetto.dev)
+# switched off, every call is one attribute check
+
+# ---------------------- define constants
+EVENTS, SCORING, PHYSICS, COLLISIONS, COMPUTER, DRAWING, HUD, DISPLAY, IDLE = range(9)
+PHASE_NAMES = ("events", "scoring", "physics", "collisions", "computer", "drawing", "hud", "display", "idle")
+PROFILE_FRAMES = FPS*2 # rolling window for the overlay
+FRAME_BUDGET = 1/FPS
+OVERLAY_SIZE = 14
+OVERLAY_REFRESH = FPS//4 # frames between overlay updates, text is slow to render
+OVERLAY_BACKGROUND = (0, 0, 0, 170)
+OVER_BUDGET = (255, 120, 120)
+OVERLAY_POS = (4, SCORE_SIZE + 4)
+TRACE_EVENTS = 12*FPS*60*5 # a frame makes about 12 events (its marks & itself), so the trace keeps the last ~5 minutes
+
+# ---------------------- define classes
+# call begin() at the top of the frame, mark(phase) as each phase finishes (a phase can be marked more than once)
+# & end() at the bottom, everything since the last mark counts towards the phase marked
+class FrameProfiler:
+    def __init__(self, frames=PROFILE_FRAMES):
+        self.enabled = False # the overlay's showing
+        self.active = False # enabled or tracing, checked by every call
+        self.times = np.zeros((frames, len(PHASE_NAMES))) # seconds, a row per frame, oldest overwritten
+        self.counts = np.zeros((frames, 2), dtype=np.intp) # bodies, candidate pairs
+        self.current = [0.0]*len(PHASE_NAMES)
+        self.frames = 0 # frames recorded
+        self.last = 0.0
+        self.frameStart = 0.0
+        self.origin = 0.0
+        self.trace = None # while tracing, rows of (phase, start, end, 0, 0) for every mark & (-1, start, end, bodies, pairs) for every frame, oldest overwritten
+        self.traced = 0 # rows written
+        self.tracePath = None
+        self.font = None
+        self.overlay = None
+        self.overlayFrame = -1
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.active = self.enabled or self.trace is not None
+
+    # records frames until the program exits, then writes the last TRACE_EVENTS rows to path
+    def startTrace(self, path: str, events=TRACE_EVENTS):
+        self.trace, self.tracePath = np.zeros((events, 5)), path
+        self.traced = 0
+        self.active = True
+        self.origin = time.perf_counter()
+        atexit.register(self.saveTrace)
+
+    def begin(self):
+        if not self.active:
+            return
+        self.last = self.frameStart = time.perf_counter()
+        for i in range(len(self.current)):
+            self.current[i] = 0.0
+
+    def mark(self, phase: int):
+        if not self.active:
+            return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        if self.trace is not None:
+            self.trace[self.traced % len(self.trace)] = phase, self.last, now, 0, 0
+            self.traced += 1
+        self.last = now
+
+    def end(self, bodies: int, pairs: int):
+        if not self.active:
+            return
+        row = self.frames % len(self.times)
+        self.times[row] = self.current
+        self.counts[row] = bodies, pairs
+        self.frames += 1
+        if self.trace is not None:
+            self.trace[self.traced % len(self.trace)] = -1, self.frameStart, self.last, bodies, pairs
+            self.traced += 1
+
+    # rolling stats in ms: mean & p99 per phase, then the same for the whole frame without idle
+    def stats(self):
+        times = self.times[:min(self.frames, len(self.times))]*1000
+        busy = times[:, :IDLE].sum(axis=1)
+        return times.mean(axis=0), np.percentile(times, 99, axis=0), busy.mean(), np.percentile(busy, 99)
+
+    # the rect the overlay covers, and a signature that changes when it's redrawn
+    def overlayRect(self):
+        self.refresh()
+        return self.overlay.get_rect(topleft=OVERLAY_POS)
+
+    def signature(self):
+        return self.overlayFrame
+
+    def refresh(self):
+        if self.overlay is not None and self.frames - self.overlayFrame < OVERLAY_REFRESH:
+            return
+        self.overlayFrame = self.frames
+        if self.font is None:
+            self.font = assets.font("menlo", OVERLAY_SIZE)
+        lines = []
+        if self.frames:
+            mean, p99, busyMean, busyP99 = self.stats()
+            lines.append(("frame %6.2f  p99 %6.2f  / %.1f ms" % (busyMean, busyP99, FRAME_BUDGET*1000), busyP99 > FRAME_BUDGET*1000))
+            for phase, name in enumerate(PHASE_NAMES):
+                lines.append(("%-10s %6.2f  p99 %6.2f" % (name, mean[phase], p99[phase]), phase != IDLE and p99[phase] > FRAME_BUDGET*1000))
+            bodies, pairs = self.counts[(self.frames-1) % len(self.counts)]
+            lines.append(("bodies %d  pairs %d" % (bodies, pairs), False))
+        else:
+            lines.append(("profiling...", False))
+        rendered = [self.font.render(text, True, OVER_BUDGET if over else WHITE) for text, over in lines]
+        width, height = max(line.get_width() for line in rendered), sum(line.get_height() for line in rendered)
+        self.overlay = pygame.Surface((width + 8, height + 8), pygame.SRCALPHA)
+        self.overlay.fill(OVERLAY_BACKGROUND)
+        y = 4
+        for line in rendered:
+            self.overlay.blit(line, (4, y))
+            y += line.get_height()
+
+    def draw(self, surf: pygame.Surface):
+        surf.blit(self.overlay, OVERLAY_POS)
+
+    # chrome trace event format: complete ("X") events in microseconds, phases nested inside their frame
+    def saveTrace(self):
+        if not self.traced:
+            return
+        oldest = self.traced % len(self.trace) if self.traced > len(self.trace) else 0
+        events = []
+        for phase, start, end, bodies, pairs in np.roll(self.trace[:self.traced], -oldest, axis=0).tolist():
+            phase = int(phase)
+            event = {"name": PHASE_NAMES[phase] if phase >= 0 else "frame", "ph": "X", "pid": 1, "tid": 1,
+                     "ts": round((start - self.origin)*1e6, 1), "dur": round((end - start)*1e6, 1)}
+            if phase < 0:
+                event["args"] = {"bodies": int(bodies), "pairs": int(pairs)}
+            events.append(event)
+        with open(self.tracePath, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        self.traced = 0
+
+# how long each step of starting up took, for --startup-report
+# mark(name) as each step finishes, counting from start (a time.perf_counter() taken before the imports)
+class StartupReport:
+    def __init__(self, start: float):
+        self.start = self.last = start
+        self.steps = [] # (name, seconds)
+
+    def mark(self, name: str):
+        now = time.perf_counter()
+        self.steps.append((name, now - self.last))
+        self.last = now
+
+    # the time since the last mark wasn't spent starting up (someone sat on the title screen), leave it out
+    def skip(self):
+        now = time.perf_counter()
+        self.start += now - self.last
+        self.last = now
+
+    def print(self, file=None):
+        for name, seconds in self.steps:
+            print("%-20s %7.1f ms" % (name, seconds*1000), file=file)
+        print("%-20s %7.1f ms" % ("total", (self.last - self.start)*1000), file=file)
+        self.steps = []
@@ -0,0 +1,302 @@
+import pygame
+import numpy as np
+from collections import OrderedDict
+from fractions import Fraction
+
+# ---------------------- define constants
+MAX_DIRTY_RECTS = 64 # past this many changes, repainting everything is cheaper than tracking them
+TEXT_CACHE_SIZE = 128
+IDLE_TIMEOUT = 1000 # ms, longest an idle frame waits with nothing due, only a safety net
+SMOOTH, INTEGER = "smooth", "integer" # ScaledDisplay modes
+SCALE_STEPS = 8 # smooth scales are whole eighths, so rects on multiples of 8 logical pixels land on whole window pixels
+LETTERBOX = (0, 0, 0)
+
+# ---------------------- define classes
+# redraws only what changed since the last frame, on top of a prerendered background
+# every frame, add() everything that should be on screen, in drawing order, then render()
+# things whose rect & signature match last frame are left alone unless something changed underneath them
+class DirtyRenderer:
+    def __init__(self, surf: pygame.Surface, background: pygame.Surface):
+        self.surf = surf
+        self.background = background
+        self.items = [] # (key, rect, signature, draw, args) for this frame
+        self.last = {} # key -> (rect, signature) drawn last frame
+        self.fullRedraw = True
+        self.repainted = False # the last render() drew everything over the background, see ScaledDisplay.present()
+
+    # background changed (or something else drew over the screen), repaint everything next render()
+    def invalidate(self):
+        self.fullRedraw = True
+
+    def setBackground(self, background: pygame.Surface):
+        self.background = background
+        self.invalidate()
+
+    # draw(surf, *args) is called if the item needs drawing, it must stay inside rect
+    # signature is anything comparable that changes when the item looks different
+    def add(self, key, rect: pygame.Rect, signature, draw, *args):
+        self.items.append((key, rect, signature, draw, args))
+
+    # draws this frame's items, returns the rects that changed for pygame.display.update()
+    def render(self):
+        items, self.items = self.items, []
+        current = {key: (rect, signature) for key, rect, signature, draw, args in items}
+
+        if not self.fullRedraw:
+            dirty = self._changed(current)
+            if len(dirty) <= MAX_DIRTY_RECTS:
+                self.repainted = False
+                return self._redraw(items, dirty)
+        self.last = current
+
+        self.surf.blit(self.background, (0, 0))
+        for key, rect, signature, draw, args in items:
+            draw(self.surf, *args)
+        self.fullRedraw = False
+        self.repainted = True
+        return [self.surf.get_rect()]
+
+    # rects where something moved, changed, appeared or disappeared
+    def _changed(self, current: dict):
+        dirty = []
+        for key, old in self.last.items(): # clean up where it was
+            if current.get(key) != old:
+                dirty.append(old[0])
+                if len(dirty) > MAX_DIRTY_RECTS: # render() repaints everything, no need to look further
+                    return dirty
+        for key, new in current.items(): # draw where it is now
+            if self.last.get(key) != new:
+                dirty.append(new[0])
+                if len(dirty) > MAX_DIRTY_RECTS:
+                    return dirty
+        self.last = current
+        return dirty
+
+    def _redraw(self, items: list, dirty: list):
+        if not dirty:
+            return []
+
+        dirty = mergeRects(dirty)
+        for area in dirty:
+            # restore the background, then redraw everything touching the area clipped to it
+            # so translucent things aren't blended twice outside it
+            self.surf.set_clip(area)
+            self.surf.blit(self.background, area, area)
+            for key, rect, signature, draw, args in items:
+                if rect.colliderect(area):
+                    draw(self.surf, *args)
+        self.surf.set_clip(None)
+        return dirty
+
+# rendered text surfaces, so text that doesn't change is only rasterized once
+# least recently used strings are dropped when it's full
+class TextCache:
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.surfaces = OrderedDict() # (font, text, color, antialias) -> surface
+        self.hits = 0
+        self.misses = 0
+
+    # same arguments as font.render(), don't draw onto the returned surface, it's shared
+    def render(self, font: pygame.font.Font, text: str, antialias: bool, color: tuple):
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+# surfaces drawn once & reused, keyed by everything that changes how they look
+class SpriteCache:
+    def __init__(self):
+        self.sprites = {}
+
+    # returns the sprite for key, building it with build(*args) the first time
+    def get(self, key, build, *args):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = build(*args)
+            self.sprites[key] = sprite
+        return sprite
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def clear(self):
+        self.sprites.clear()
+
+# paces the loops: FPS while anything's happening, else sleeps until an event (or something timed is due)
+# use events() in place of pygame.event.get() & tick(idle) in place of clock.tick(FPS)
+class FrameScheduler:
+    def __init__(self, fps: int):
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.woken = [] # the event an idle wait woke up for, handed out by the next events()
+        self.idleFrames = 0
+
+    def events(self):
+        events, self.woken = self.woken, []
+        return events + pygame.event.get()
+
+    # idle: nothing can change until an event comes in, or for timeout ms (None: no timer running)
+    def tick(self, idle=False, timeout=None):
+        if not idle:
+            self.clock.tick(self.fps)
+            return
+        self.idleFrames += 1
+        event = pygame.event.wait(max(1, min(IDLE_TIMEOUT if timeout is None else timeout, IDLE_TIMEOUT)))
+        if event.type != pygame.NOEVENT:
+            self.woken.append(event)
+        self.clock.tick() # the next busy frame is paced from now
+
+# the game draws at a fixed logical size into surface, which is scaled to fit the window (letterboxed)
+# INTEGER scales by whole numbers, for crisp pixels, SMOOTH fills as much of the window as it can, filtered
+# only what changed gets scaled: dirty rects one by one, and after a full repaint a copy of the background scaled once
+# (again only when it changes) goes down first, then just the items on it
+# mode None draws straight into the window, which has to be the logical size
+class ScaledDisplay:
+    def __init__(self, window: pygame.Surface, size: tuple, mode=None):
+        self.window = window
+        self.size = (int(size[0]), int(size[1]))
+        self.mode = mode
+        self.surface = window if mode is None else pygame.Surface(self.size).convert(window)
+        self.scaledBackground = None
+        self.scaledFrom = None # the background scaledBackground was made from
+        self.layout()
+
+    # where the logical surface goes in the window, worked out again whenever the window changes size
+    def layout(self):
+        self.windowSize = self.window.get_size()
+        width, height = self.size
+        fit = min(self.windowSize[0]/width, self.windowSize[1]/height)
+        if self.mode is None:
+            self.scale = Fraction(1)
+        elif self.mode == INTEGER and fit >= 1:
+            self.scale = Fraction(int(fit))
+        else: # smooth, or a window too small for whole numbers
+            self.scale = Fraction(max(1, int(fit*SCALE_STEPS)), SCALE_STEPS)
+        self.scaledSize = (width*self.scale.numerator//self.scale.denominator, height*self.scale.numerator//self.scale.denominator)
+        self.offset = ((self.windowSize[0] - self.scaledSize[0])//2, (self.windowSize[1] - self.scaledSize[1])//2)
+        self.scaledBackground = self.scaledFrom = None
+        if self.mode == SMOOTH and self.scale > 1:
+            self.columns = expandTable(width, self.scaledSize[0])
+            self.rows = expandTable(height, self.scaledSize[1])
+        if self.mode is not None:
+            self.window.fill(LETTERBOX)
+
+    # the mouse in logical coordinates
+    def mouse(self):
+        x, y = pygame.mouse.get_pos()
+        if self.mode is None:
+            return x, y
+        return (int((x - self.offset[0])/self.scale), int((y - self.offset[1])/self.scale))
+
+    # shows the logical rects (None: everything) in the window
+    def update(self, rects=None):
+        if self.mode is None:
+            pygame.display.update(rects)
+            return
+        if self.resized() or rects is None:
+            self._scale(self.surface.get_rect())
+            pygame.display.update()
+            return
+        pygame.display.update([target for target in map(self._scale, rects) if target is not None])
+
+    # same as update(dirty) after renderer.render(), but a full repaint starts from the pre-scaled background
+    def present(self, renderer: DirtyRenderer, dirty: list):
+        if self.mode is None or not renderer.repainted or self.resized():
+            self.update(dirty)
+            return
+        if self.scaledFrom is not renderer.background:
+            self.scaledBackground = self._scaler()(renderer.background, self.scaledSize)
+            self.scaledFrom = renderer.background
+        self.window.blit(self.scaledBackground, self.offset)
+        rects = [rect for rect, signature in renderer.last.values()]
+        # covers it all anyway, or so many that one scale of everything is quicker
+        if len(rects) > MAX_DIRTY_RECTS or sum(rect.width*rect.height for rect in rects) >= self.size[0]*self.size[1]:
+            rects = [self.surface.get_rect()]
+        for rect in rects:
+            self._scale(rect)
+        pygame.display.update(pygame.Rect(self.offset, self.scaledSize))
+
+    def resized(self):
+        window = pygame.display.get_surface()
+        if window is self.window and window.get_size() == self.windowSize:
+            return False
+        self.window = window
+        self.layout()
+        return True
+
+    def _scaler(self):
+        return pygame.transform.smoothscale if self.mode == SMOOTH else pygame.transform.scale
+
+    # scales one logical rect straight into the window, returns where it went (None if it's off the surface)
+    # the rect is widened to whole steps of the scale, so it starts & ends on whole window pixels
+    def _scale(self, rect: pygame.Rect):
+        rect = pygame.Rect(rect).clip(self.surface.get_rect())
+        if not rect.width or not rect.height:
+            return None
+        p, q = self.scale.numerator, self.scale.denominator
+        left, top = rect.left//q*q, rect.top//q*q
+        right, bottom = min(-(-rect.right//q)*q, self.size[0]), min(-(-rect.bottom//q)*q, self.size[1])
+        x, y = left*p//q, top*p//q
+        target = pygame.Rect(self.offset[0] + x, self.offset[1] + y, right*p//q - x, bottom*p//q - y)
+        if not target.width or not target.height:
+            return None
+        if self.mode == SMOOTH and self.scale > 1 and target.size != self.scaledSize:
+            # pixels just outside the target blend in the rect's edge too
+            target = target.inflate(p//q*2 + 2, p//q*2 + 2).clip(pygame.Rect(self.offset, self.scaledSize))
+            self._expand(target.move(-self.offset[0], -self.offset[1]))
+            return target
+        source = self.surface.subsurface((left, top, right - left, bottom - top))
+        self._scaler()(source, target.size, self.window.subsurface(target))
+        return target
+
+    # smoothscale's blend of pixels near each other, but for part of the window
+    # smoothscale samples the rect it's given on its own grid, which doesn't line up with the whole surface's
+    # (patches would be up to a pixel off from their neighbours), so this works from the whole surface's grid
+    # shrinking doesn't need it, each window pixel only averages the pixels under it, so aligned rects already match
+    def _expand(self, area: pygame.Rect):
+        columns, columnWeights = self.columns[0][area.left:area.right], self.columns[1][area.left:area.right]
+        rows, rowWeights = self.rows[0][area.top:area.bottom], self.rows[1][area.top:area.bottom]
+        pixels = pygame.surfarray.pixels3d(self.surface)
+        source = pixels[columns[0]:columns[-1]+2, rows[0]:rows[-1]+2].astype(np.uint16) # 255*256 at most, fits
+        del pixels # unlocks the surface
+        columns, rows = columns - columns[0], rows - rows[0]
+        weight = columnWeights[:, None, None]
+        blended = (source[columns]*(256 - weight) + source[columns+1]*weight) >> 8 # across, then down, same as smoothscale
+        weight = rowWeights[None, :, None]
+        blended = (blended[:, rows]*(256 - weight) + blended[:, rows+1]*weight) >> 8
+        pygame.surfarray.blit_array(self.window.subsurface(area.move(self.offset)), blended)
+
+textCache = TextCache() # shared by every text draw in the game
+sprites = SpriteCache()
+
+#  ---------------------- define functions
+# for each pixel of a row (or column) length size scaled up to scaled: the pixel it starts from in the original, & how
+# much of the next one is blended in, out of 256 (the same sampling & weights as pygame.transform.smoothscale)
+def expandTable(size: int, scaled: int):
+    x = np.arange(scaled, dtype=np.int64)
+    return x*(size - 1)//scaled, (256*(x*(size - 1) % scaled)//scaled).astype(np.uint16)
+
+# merges overlapping rects, so no area is restored & drawn more than once
+def mergeRects(rects: list):
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
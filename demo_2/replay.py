@@ -0,0 +1,207 @@
+import sys, mmap, struct, argparse
+import pygame
+import pygame.locals
+
+from constants import *
+from game import Match, COLOR_CODES
+
+# matches recorded as the inputs that change them, the game is deterministic so playing them again gives the same match
+# a few hundred bytes per turn, plus a packed copy of the match (a keyframe) every few turns to seek from
+#   python soccer.py --record replays
+#   python replay.py replays/match-20260101-120000.rpl --turn 10
+
+# ---------------------- define constants
+MAGIC = b"SRPL"
+VERSION = 3
+HEADER = struct.Struct("<4sHH") # magic, version, turns between keyframes
+KEYFRAME_TURNS = 2
+
+# every record starts with its kind & the world frame it happened on, before that frame's step
+RECORD = struct.Struct("<BI")
+SHOT, GRENADE_PLACED, GLUE_PLACED, TURN, KEYFRAME = range(5)
+SHOT_DATA = struct.Struct("<Hdd") # body row, velocity
+POWERUP_DATA = struct.Struct("<dd") # x, y
+TURN_DATA = struct.Struct("<IB") # turns taken, color code of whose turn it is now
+KEYFRAME_DATA = struct.Struct("<II") # turns taken, length of the packed match that follows
+SIZES = {SHOT: SHOT_DATA.size, GRENADE_PLACED: POWERUP_DATA.size, GLUE_PLACED: POWERUP_DATA.size, TURN: TURN_DATA.size}
+
+# ---------------------- define classes
+# writes a match as it's played, set as match.recorder (Match calls it on every shot & powerup)
+class Recorder:
+    def __init__(self, path: str, keyframeTurns=KEYFRAME_TURNS):
+        self.file = open(path, "wb")
+        self.keyframeTurns = keyframeTurns
+        self.file.write(HEADER.pack(MAGIC, VERSION, keyframeTurns))
+
+    # starts recording match from its current state
+    def start(self, match: Match):
+        match.recorder = self
+        self.keyframe(match)
+
+    def shot(self, frame: int, index: int, vel):
+        self.file.write(RECORD.pack(SHOT, frame) + SHOT_DATA.pack(index, vel[0], vel[1]))
+
+    def grenade(self, frame: int, x: float, y: float):
+        self.file.write(RECORD.pack(GRENADE_PLACED, frame) + POWERUP_DATA.pack(x, y))
+
+    def glue(self, frame: int, x: float, y: float):
+        self.file.write(RECORD.pack(GLUE_PLACED, frame) + POWERUP_DATA.pack(x, y))
+
+    # after every shot, once the turn has swapped
+    def turn(self, match: Match):
+        self.file.write(RECORD.pack(TURN, match.world.frame) + TURN_DATA.pack(match.turns, COLOR_CODES.index(match.turn)))
+        if match.turns % self.keyframeTurns == 0:
+            self.keyframe(match)
+        self.file.flush() # a crash or quit loses at most the turn being played
+
+    def keyframe(self, match: Match):
+        packed = match.pack()
+        self.file.write(RECORD.pack(KEYFRAME, match.world.frame) + KEYFRAME_DATA.pack(match.turns, len(packed)) + packed)
+
+    def close(self):
+        self.file.close()
+
+# plays a recording back, the file is memory mapped so opening & seeking only reads what's needed
+class Replay:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.keyframeTurns = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s isn't a version %d replay" % (path, VERSION))
+
+        # index the records, skipping over keyframes without reading them
+        self.records = [] # (kind, frame, offset of the data after the record header)
+        self.keyframes = [] # (turns, record number)
+        offset = HEADER.size
+        while offset + RECORD.size <= len(self.data):
+            kind, frame = RECORD.unpack_from(self.data, offset)
+            offset += RECORD.size
+            if kind == KEYFRAME:
+                turns, length = KEYFRAME_DATA.unpack_from(self.data, offset)
+                if offset + KEYFRAME_DATA.size + length > len(self.data):
+                    break # cut off mid-write
+                self.keyframes.append((turns, len(self.records)))
+                self.records.append((kind, frame, offset))
+                offset += KEYFRAME_DATA.size + length
+            else:
+                if offset + SIZES[kind] > len(self.data):
+                    break
+                self.records.append((kind, frame, offset))
+                offset += SIZES[kind]
+        self.turns = max([TURN_DATA.unpack_from(self.data, offset)[0] for kind, frame, offset in self.records if kind == TURN], default=0)
+
+        self.match = Match()
+        self.cursor = 0 # next record to apply
+        self.seek(0)
+
+    # jumps to the moment turn began (0 is the start of the match), from the nearest keyframe before it
+    def seek(self, turn: int):
+        turn = max(0, min(turn, self.turns))
+        turns, record = max(keyframe for keyframe in self.keyframes if keyframe[0] <= turn)
+        offset = self.records[record][2]
+        self.match.unpack(self.data, offset + KEYFRAME_DATA.size)
+        self.cursor = record + 1
+        # same order as the game loop: kickoff, or this frame's inputs then the step
+        match = self.match
+        while match.turns < turn:
+            if match.readyForKickoff():
+                match.kickoff()
+            elif not self.applyDue():
+                match.step()
+
+    # one frame of the game loop, returns whether the recording has run out & everything has stopped
+    def tick(self):
+        match = self.match
+        if match.readyForKickoff():
+            match.kickoff()
+            return False
+        if self.cursor == len(self.records) and match.nothingMoving():
+            return True
+        while self.applyDue():
+            pass
+        match.step()
+        return False
+
+    # applies the next record if it's due this frame, returns whether there was one
+    def applyDue(self):
+        if self.cursor == len(self.records) or self.records[self.cursor][1] > self.match.world.frame:
+            return False
+        self.apply(*self.records[self.cursor])
+        self.cursor += 1
+        return True
+
+    def apply(self, kind: int, frame: int, offset: int):
+        match = self.match
+        if kind == SHOT:
+            index, vx, vy = SHOT_DATA.unpack_from(self.data, offset)
+            match.shoot(match.objects[index], (vx, vy))
+        elif kind == GRENADE_PLACED:
+            match.placeGrenade(*POWERUP_DATA.unpack_from(self.data, offset))
+        elif kind == GLUE_PLACED:
+            match.placeGlue(*POWERUP_DATA.unpack_from(self.data, offset))
+        # turns & keyframes are only for seeking
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+#  ---------------------- define functions
+# watches a recording: left & right arrows jump between turns, space pauses
+def main():
+    parser = argparse.ArgumentParser(description="Watch a recorded soccer match.")
+    parser.add_argument("path")
+    parser.add_argument("--turn", type=int, default=0, help="start at this turn")
+    args = parser.parse_args()
+    from soccer import renderBackground, queueObjects # the game's own drawing, soccer imports this module too
+    from render import DirtyRenderer, textCache
+    from assets import assets, SCORE_FONT
+
+    replay = Replay(args.path)
+    replay.seek(args.turn)
+
+    pygame.init()
+    DISPLAYSURF = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Soccer replay")
+    clock = pygame.time.Clock()
+    scoreFont = assets.font(*SCORE_FONT)
+    renderer = DirtyRenderer(DISPLAYSURF, renderBackground(replay.match.glues, replay.match.arena))
+    glueLayout = []
+    paused = False
+    while 1:
+        for event in pygame.event.get():
+            if event.type == pygame.locals.QUIT:
+                replay.close()
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.locals.KEYDOWN:
+                if event.key == pygame.locals.K_LEFT:
+                    replay.seek(replay.match.turns-1)
+                if event.key == pygame.locals.K_RIGHT:
+                    replay.seek(replay.match.turns+1)
+                if event.key == pygame.locals.K_SPACE:
+                    paused = not paused
+        if not paused:
+            replay.tick()
+
+        match = replay.match
+        if [(glue.x, glue.y) for glue in match.glues] != glueLayout:
+            glueLayout = [(glue.x, glue.y) for glue in match.glues]
+            renderer.setBackground(renderBackground(match.glues, match.arena))
+        queueObjects(renderer, match)
+
+        turnText = textCache.render(scoreFont, "Turn %d/%d" % (match.turns, replay.turns), True, WHITE)
+        turnTextRect = turnText.get_rect(midbottom=(SCREEN_WIDTH/2, SCREEN_HEIGHT))
+        renderer.add("turnText", turnTextRect, match.turns, pygame.Surface.blit, turnText, turnTextRect)
+        blueScoreText = textCache.render(scoreFont, "Blue score: " + str(match.blueScore), True, BLUE)
+        blueScoreRect = blueScoreText.get_rect(topleft = (0, 0))
+        renderer.add("blueScore", blueScoreRect, match.blueScore, pygame.Surface.blit, blueScoreText, blueScoreRect)
+        redScoreText = textCache.render(scoreFont, "Red score: " + str(match.redScore), True, RED)
+        redScoreRect = redScoreText.get_rect(topright = (SCREEN_WIDTH, 0))
+        renderer.add("redScore", redScoreRect, match.redScore, pygame.Surface.blit, redScoreText, redScoreRect)
+
+        pygame.display.update(renderer.render())
+        clock.tick(FPS)
+
+if __name__ == "__main__":
+    main()
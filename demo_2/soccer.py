@@ -1,232 +1,28 @@
-import pygame, sys
+import time
+STARTED = time.perf_counter() # before the other imports, for --startup-report
+import pygame, os, sys, gc, argparse
 import pygame.locals
-import numpy as np
+
+from constants import *
+from game import Arena, Match, Snapshot, distance, shotVelocity, simulate
+from physics import EFFECTS
+from render import DirtyRenderer, FrameScheduler, ScaledDisplay, textCache, sprites, SMOOTH, INTEGER
+from assets import assets, BUTTON_IMAGES, DISPLAY_FONT, INFO_FONT, SCORE_FONT, TITLE_FONT
+from profiler import FrameProfiler, StartupReport, EVENTS, SCORING, COMPUTER, DRAWING, HUD, DISPLAY, IDLE
+# the shot preview, the computer player, replays & online play are imported when a game starts, to open the window sooner
 
 # ---------------------- define constants
-# pygame
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
-FPS = 60
-
-# text
-DISPLAY_SIZE = 80
-INFO_SIZE = 35
-SCORE_SIZE = 30
-TITLE_SIZE = 160
-
-# colors
-GREEN = (0, 170, 0)
-BLUE = (0, 0, 255)
-RED = (255, 0, 0)
-WHITE = (255, 255, 255)
-GOLD = (190, 190, 0)
-BLACK = (0, 0, 0)
-YELLOW = (210, 210, 0)
-TRANSPARENT_BLACK = (0, 0, 0, 185)
-TRANSPARENT_YELLOW = (210, 210, 0, 185)
-
-# game constants
-# field
-FIELD_WIDTH = 600
-FIELD_HEIGHT = 400
-X_GAP = (SCREEN_WIDTH-FIELD_WIDTH)/2
-Y_GAP = (SCREEN_HEIGHT-FIELD_HEIGHT)/2
-GOAL_DEPTH = 45
-GOAL_HEIGHT = 100
-GOAL_TOP = Y_GAP+FIELD_HEIGHT/2-GOAL_HEIGHT/2
-GOAL_BOTTOM = GOAL_TOP+GOAL_HEIGHT
-LEFT_GOAL_BACK = X_GAP-GOAL_DEPTH
-RIGHT_GOAL_BACK = SCREEN_WIDTH-X_GAP+GOAL_DEPTH
-# ball
-BALL_MASS = 8
-BALL_SIZE = 10
-# player
-PLAYER_MASS = 30
-PLAYER_SIZE = 20
-# grenade powerup
-GRENADE_SIZE = 15 # during powerup select
-FRAG_COUNT = 16
-FRAG_MASS = 40
-FRAG_SIZE = 3
-FRAG_VEL = FPS * 0.25
-FRAG_LIFETIME = 120 # milliseconds
-# glue powerup
-GLUE_SIZE = 50
-GLUE_FRICTION = 0.9
-GLUE_LIFE = 3 # rounds - is removed the moment the 3rd round begins (player moves)
-# physics
-MAX_VEL = FPS*0.2
-AIM_TWEAK = 10 # smaller number = less difference bt big aim and small aim
-FRICTION = 0.97
-FRICTION_COEFFICIENT = 0.15 # for collisions
-RESTITUTION = 0.8 # bounciness
-# buttons
-NUM_BUTTONS = 2
-ICON_SIZE = 64
-BUTTON_GAP = Y_GAP/2
-BUTTON_Y = SCREEN_HEIGHT-Y_GAP/2-ICON_SIZE/2
 BUTTON_RECT = pygame.Rect(0, 0, ICON_SIZE, ICON_SIZE) # for powerups, drawn on a different surface
-# misc
-SELECTED_THICKNESS = 5
-SPAWNS = ((FIELD_WIDTH/5, FIELD_HEIGHT/3), (FIELD_WIDTH/5,FIELD_HEIGHT*2/3), (FIELD_WIDTH/3, FIELD_HEIGHT/2))
-WIN_SCORE = 3
-
-# strings
-GRENADE = "Grenade"
-GLUE = "Glue"
+BANNER_TIME = 5000 # ms the score banner shows
+WAKE_EVENT = pygame.event.custom_type() # posted from other threads to wake an idle frame
 
 
 # ---------------------- define classes
-class PhysicalObject:
-    def __init__(self, x: int, y: int, mass: int, size: int, color: tuple, type=""):
-        self.x = x
-        self.y = y
-        self.mass = mass
-        self.size = size # radius of circle
-        self.color = color
-        self.type = type
-
-        self.v = np.zeros(2, dtype=np.float64)
-        self.moving = np.linalg.norm(self.v) > 0.001
-
-    def draw(self, surf: pygame.Surface):
-        pygame.draw.circle(surf, self.color, (self.x, self.y), self.size)
-
-    def updatePos(self, glues=[]):
-        self.x += self.v[0]
-        self.y += self.v[1]
-
-        friction = FRICTION
-        for glue in glues:
-            if distance(glue.x, glue.y, self.x,self.y) <= GLUE_SIZE+PLAYER_SIZE: # player is in glue
-                friction = GLUE_FRICTION # so they are frictioned more
-                break
-        self.v *= friction
-
-        self.moving = np.linalg.norm(self.v) > 0.001
-
-    # does NOT check for collision, only handles it
-    def handleCollision(self, other): # THANKS ALEX
-        # Calculate the vector between the objects
-        delta = np.array([self.x - other.x, self.y - other.y])
-        distance = np.linalg.norm(delta)
-        
-        # Calculate overlap
-        overlap = self.size + other.size - distance
-        
-        if overlap > 0:
-            # Normalize the delta vector
-            normal = delta / distance
-            
-            # Separate the objects
-            separation = overlap * normal * 0.5
-            self.x += separation[0]
-            self.y += separation[1]
-            other.x -= separation[0]
-            other.y -= separation[1]
-            
-            # Calculate relative velocity
-            relative_velocity = self.v - other.v
-            
-            # Calculate velocity along the normal
-            velocity_along_normal = np.dot(relative_velocity, normal)
-            
-            # Do not resolve if velocities are separating
-            if velocity_along_normal > 0:
-                return
-            
-            # Calculate impulse scalar
-            impulse_scalar = -(1 + RESTITUTION) * velocity_along_normal
-            impulse_scalar /= 1/self.mass + 1/other.mass
-            
-            # Apply impulse
-            impulse = impulse_scalar * normal
-            self.v += impulse / self.mass
-            other.v -= impulse / other.mass
-            
-            # Apply friction
-            tangent = np.array([-normal[1], normal[0]])
-            friction_impulse_scalar = np.dot(relative_velocity, tangent) * FRICTION_COEFFICIENT
-            friction_impulse_scalar /= 1/self.mass + 1/other.mass
-            
-            # Ensure friction doesn't reverse velocity
-            if friction_impulse_scalar < 0:
-                friction_impulse = friction_impulse_scalar * tangent
-            else:
-                friction_impulse = -friction_impulse_scalar * tangent
-            
-            self.v += friction_impulse / self.mass
-            other.v -= friction_impulse / other.mass
-            
-            # Limit velocities to MAX_VEL
-            self.v = np.clip(self.v, -MAX_VEL, MAX_VEL)
-            other.v = np.clip(other.v, -MAX_VEL, MAX_VEL)
-    
-    # detects and handles collision with the wall
-    def handleWallCollision(self):
-        # field walls
-        if (self.y-self.size < Y_GAP): # top
-            self.v[1] = -self.v[1]
-            self.y = Y_GAP + self.size
-        if (self.y+self.size > Y_GAP+FIELD_HEIGHT): # bottom
-            self.v[1] = -self.v[1]
-            self.y = Y_GAP + FIELD_HEIGHT - self.size
-        # take into account the goal for left/right
-        if (self.y-self.size < GOAL_TOP or self.y+self.size > GOAL_BOTTOM):
-            if (self.x-self.size < X_GAP): # left
-                self.v[0] = -self.v[0] # reflect velocity horizontally
-                self.x = X_GAP + self.size # move it out of the wall
-            if (self.x+self.size > X_GAP+FIELD_WIDTH): # right
-                self.v[0] = -self.v[0]
-                self.x = X_GAP + FIELD_WIDTH - self.size
-        
-        # goal walls
-        if (self.x-self.size < LEFT_GOAL_BACK): # left goal back
-            self.v[0] = -self.v[0]
-            self.x = LEFT_GOAL_BACK + self.size
-        if (self.x+self.size > RIGHT_GOAL_BACK): # right goal back
-            self.v[0] = -self.v[0]
-            self.x = RIGHT_GOAL_BACK - self.size
-        # take into account object has to be inside goal
-        if (self.x < X_GAP or self.x > X_GAP + FIELD_WIDTH):
-            if (self.y-self.size < GOAL_TOP): # goal top
-                self.v[1] = -self.v[1]
-                self.y = GOAL_TOP + self.size
-            if (self.y+self.size > GOAL_BOTTOM): # goal bottom
-                self.v[1] = -self.v[1]
-                self.y = GOAL_BOTTOM - self.size
-
-class Player(PhysicalObject):
-    hovered = False
-    def __init__(self, x, y, color):
-        super().__init__(x, y, PLAYER_MASS, PLAYER_SIZE, color)
-
-    def draw(self, surf):
-        super().draw(surf)
-        if self.hovered:
-            pygame.draw.circle(surf, WHITE, (self.x, self.y), self.size, width=SELECTED_THICKNESS)
-
-class Fragment(PhysicalObject):
-    def __init__(self, x: int, y: int, mass: int, size: int, color: tuple):
-        super().__init__(x, y, mass, size, color, "frag")
-        self.spawnTime = pygame.time.get_ticks()
-        
-class FieldObject:
-    def __init__ (self, x: int, y: int, size: int, color: tuple, lifetime=-1):
-        self.x = x
-        self.y = y
-        self.size = size
-        self.color = color
-        self.lifetime = lifetime
-    
-    def draw(self, surf: pygame.Surface):
-        pygame.draw.circle(surf, self.color, (self.x, self.y), self.size)
-
 class MenuButton:
     def __init__(self, color: tuple, center: tuple, img: str):
         self.color = color
         self.center = center
-        self.img = pygame.image.load(img)
+        self.img = assets.image(img)
         self.rect = pygame.Rect(self.center[0]-ICON_SIZE/2, self.center[1]-ICON_SIZE/2, ICON_SIZE, ICON_SIZE)
 
         self.hovered = False
@@ -261,25 +57,42 @@ class Button:
 class PowerupButton(Button):
     def __init__(self, rect: pygame.Rect, name: str, img: str):
         self.name = name
-        self.img = pygame.image.load(img)
+        self.img = assets.image(img)
         assert self.img.get_width() == ICON_SIZE and self.img.get_height() == ICON_SIZE, "Image is wrong size for powerup"
 
         super().__init__(BLUE, rect)
    
     def draw(self, surf: pygame.Surface, powerupAvailable=True):
+        key = (self.name, self.color, self.hovered, self.selected, powerupAvailable)
+        buttonSurf = sprites.get(key, self.bake, self.color, self.hovered, self.selected, powerupAvailable)
+        surf.blit(buttonSurf, (self.rect.left, self.rect.top))
+
+    # draws one look of the button onto its own surface, drawn once & reused from sprites
+    def bake(self, color: tuple, hovered: bool, selected: bool, powerupAvailable: bool):
         buttonSurf = pygame.Surface((ICON_SIZE, ICON_SIZE), pygame.SRCALPHA)
         buttonSurf.fill((0,0,0,0))
         if not powerupAvailable: # if powerup isn't available, "grey out" the icon
             buttonSurf.set_alpha(170)
 
-        super().draw(buttonSurf, drawRect=BUTTON_RECT) # draw button rectangle
+        look = Button(color, BUTTON_RECT)
+        look.hovered, look.selected = hovered, selected
+        look.draw(buttonSurf) # draw button rectangle
         buttonSurf.blit(self.img, BUTTON_RECT)
-        surf.blit(buttonSurf, (self.rect.left, self.rect.top))
+        return buttonSurf
+
+    # bakes every look up front, so the first hover or click doesn't cost a frame
+    def prebake(self, colors=(BLUE, RED)):
+        for color in colors:
+            for hovered in (False, True):
+                for selected in (False, True):
+                    for powerupAvailable in (False, True):
+                        key = (self.name, color, hovered, selected, powerupAvailable)
+                        sprites.get(key, self.bake, color, hovered, selected, powerupAvailable)
 
 class TextButton(Button):
-    def __init__(self, bgColor: tuple, text: str, font: pygame.font, textColor: tuple):
-        self.text = font.render(text, True, textColor)
-        self.rect = self.text.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2))
+    def __init__(self, bgColor: tuple, text: str, font: pygame.font, textColor: tuple, center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)):
+        self.text = textCache.render(font, text, True, textColor)
+        self.rect = self.text.get_rect(center=center)
 
         super().__init__(bgColor, self.rect)
     
@@ -288,37 +101,80 @@ class TextButton(Button):
         surf.blit(self.text, self.rect)
 
 #  ---------------------- define functions
-def distance(x1: int, y1: int, x2: int, y2: int):
-    return np.sqrt( (x1-x2)**2 + (y1-y2)**2 )
-
-def angle(x1: int, y1: int, x2: int, y2: int):
-    return np.atan2( (y2-y1), (x2-x1) )
-
-def vectorToXY(magnitude: int, direction: float):
-    x = np.cos(direction)*magnitude
-    y = np.sin(direction)*magnitude
-    return x, y
-
-def inField(x: int, y: int):
-    if (x > X_GAP and x < X_GAP+FIELD_WIDTH) and (y > Y_GAP and y < Y_GAP+FIELD_HEIGHT):
-        return True # main part of field
-    if (x > LEFT_GOAL_BACK and x < RIGHT_GOAL_BACK) and (y > GOAL_TOP and y < GOAL_BOTTOM):
-        return True # goals
-    return False
-
-def spawnGrenade(objects: list, x: int, y: int):
-    for i in range(0, FRAG_COUNT):
-        frag = Fragment(x, y, FRAG_MASS, FRAG_SIZE, BLACK)
-        vel = np.array(vectorToXY(FRAG_VEL, np.pi*i/(FRAG_COUNT/2)))
-        frag.v = vel
-        
-        objects.append(frag)
+def drawField(surf: pygame.Surface, arena: Arena):
+    surf.fill(GREEN)
+    pygame.draw.rect(surf, WHITE, pygame.Rect(arena.left, arena.top, arena.fieldWidth, arena.fieldHeight), 1) # field lines
+    pygame.draw.rect(surf, BLUE, pygame.Rect(arena.leftGoalBack, arena.goalTop, GOAL_DEPTH, arena.goalHeight), 1) # left goal
+    pygame.draw.rect(surf, RED, pygame.Rect(arena.right, arena.goalTop, GOAL_DEPTH, arena.goalHeight), 1) # right goal
+    pygame.draw.line(surf, GOLD, (arena.left, arena.goalTop), (arena.left, arena.goalBottom), 4) # left goal line
+    pygame.draw.line(surf, GOLD, (arena.right, arena.goalTop), (arena.right, arena.goalBottom), 4) # right goal line
+
+def drawObjects(surf: pygame.Surface, match: Match):
+    for glue in match.glues:
+        glue.draw(surf)
+    for obj in match.objects:
+        obj.draw(surf)
+
+# the parts of the game screen that only change when a glue is placed or runs out
+def renderBackground(glues: list, arena: Arena):
+    background = pygame.Surface((arena.width, arena.height))
+    drawField(background, arena)
+    for glue in glues:
+        glue.draw(background)
+    return background
+
+def queueObjects(renderer: DirtyRenderer, match: Match):
+    world, n = match.world, match.world.count
+    # read the world's arrays once, rather than a property per object, & work out every rect at once
+    positions = world.pos[:n].tolist()
+    sizes = world.size[:n].tolist()
+    extents = world.size[:n].astype(int) + 2 # a little extra, circles are drawn rounded to whole pixels
+    corners = (world.pos[:n].astype(int) - extents[:, None]).tolist()
+    sides = (extents*2 + 1).tolist()
+    for obj, (x, y), size, (left, top), side in zip(match.objects, positions, sizes, corners, sides):
+        rect = pygame.Rect(left, top, side, side)
+        hovered = getattr(obj, "hovered", False)
+        if hovered:
+            renderer.add(obj, rect, (x, y, obj.color, hovered), obj.draw)
+        else: # same as obj.draw, without looking the position up again
+            renderer.add(obj, rect, (x, y, obj.color, hovered), pygame.draw.circle, obj.color, (x, y), size)
+
+    # the particles are one item, they'd be too many dirty rects on their own
+    particles = world.particles
+    n = particles.count
+    if n:
+        positions, sizes = particles.pos[:n], particles.size[:n]
+        left, top = (positions - sizes[:, None]).min(axis=0).astype(int) - 2
+        right, bottom = (positions + sizes[:, None]).max(axis=0).astype(int) + 3
+        rect = pygame.Rect(left, top, right - left, bottom - top)
+        renderer.add(particles, rect, (world.frame, n), drawParticles, positions.tolist(), sizes.tolist(), particles.effect[:n].tolist())
+
+def drawParticles(surf: pygame.Surface, positions: list, sizes: list, effects: list):
+    for center, size, effect in zip(positions, sizes, effects):
+        pygame.draw.circle(surf, EFFECTS[effect].color, center, size)
+
+def drawPreview(surf: pygame.Surface, size: int, color: tuple, center: tuple):
+    alphaSurf = sprites.get(("preview", size, color), bakePreview, size, color)
+    surf.blit(alphaSurf, (center[0]-size, center[1]-size))
+
+def bakePreview(size: int, color: tuple):
+    alphaSurf = pygame.Surface((size*2, size*2), pygame.SRCALPHA) # new surface to draw the transparency
+    pygame.draw.circle(alphaSurf, color, (size, size), size)
+    return alphaSurf
+
+def infoDisplay(display: ScaledDisplay, font: pygame.font, scheduler: FrameScheduler, info: Button):
+    infoText = '''
+    Welcome to Soccer!\nDrag and release pieces to launch them.\nOne powerup per turn.\nBackspace undoes your last shot.\n
+    Grenade sets off an explosive,\nlaunching nearby objects\nGlue makes an area sticky for a round.\n
+    Try to get the ball in your opponent's goal.\nFirst to 3 goals wins.\nGood luck!
+    '''
+    infoLines = infoText.split("\n")
 
-def infoDisplay(DISPLAYSURF: pygame.Surface, font: pygame.font, clock: pygame.time.Clock, info: Button):
     # display info until user exits back to menu
+    DISPLAYSURF = display.surface
     while 1:
-        mouseX, mouseY = pygame.mouse.get_pos()
-        for event in pygame.event.get():
+        mouseX, mouseY = display.mouse()
+        for event in scheduler.events():
             if event.type == pygame.locals.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -327,68 +183,94 @@ def infoDisplay(DISPLAYSURF: pygame.Surface, font: pygame.font, clock: pygame.ti
                 if info.hovered: # info button is back button
                     return
         info.hovered = distance(info.center[0], info.center[1], mouseX, mouseY) <= ICON_SIZE/2        
-        
-        infoText = '''
-        Welcome to Soccer!\nDrag and release pieces to launch them.\nOne powerup per turn.\n
-        Grenade sets off an explosive,\nlaunching nearby objects\nGlue makes an area sticky for a round.\n
-        Try to get the ball in your opponent's goal.\nFirst to 3 goals wins.\nGood luck!
-        '''
-        infoLines = infoText.split("\n")
 
         DISPLAYSURF.fill(GREEN)
         for i in range(len(infoLines)): # display each line of text in its own line
-            text = font.render(infoLines[i], True, WHITE)
-            textRect = text.get_rect(midtop = (SCREEN_WIDTH/2, INFO_SIZE/2+INFO_SIZE*i))
+            text = textCache.render(font, infoLines[i], True, WHITE)
+            textRect = text.get_rect(midtop = (DISPLAYSURF.get_width()/2, INFO_SIZE/2+INFO_SIZE*i))
             DISPLAYSURF.blit(text, textRect)
         info.draw(DISPLAYSURF)
 
-        pygame.display.update()
-        clock.tick(FPS)
+        display.update()
+        scheduler.tick(idle=True) # nothing changes until the mouse does
+
+# WIDTHxHEIGHT from the command line, argparse turns the ValueError into a usage error
+def size(text: str):
+    width, _, height = text.partition("x")
+    width, height = int(width), int(height)
+    if width < 1 or height < 1:
+        raise ValueError(text)
+    return width, height
+
+# HOST:PORT (or just :PORT, for this machine) from the command line
+def address(text: str):
+    host, _, port = text.rpartition(":")
+    port = int(port)
+    if not 0 < port < 65536:
+        raise ValueError(text)
+    return host or "localhost", port
 
 def gameLoop(DISPLAYSURF: pygame.Surface):
     pass
 
-def main():
-    # initialize pygame
-    pygame.init()
-    DISPLAYSURF = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+# aiColor: the team the computer plays, or None for two players
+# recordDir: where to save a replay of every match, or None
+# server: (host, port) of a relay to play someone online through (see net.py), or None
+# tracePath: where to save a chrome trace of the last few minutes of frames' phases when the game exits, or None
+# startupReport: print how long each step of starting up took
+# arena: the field & teams, the classic one if None
+# windowSize: open a resizable window this big & scale the game to fit it, "fullscreen" to fill the screen, None for a window the game's own size
+# scaleMode: how it's scaled to fit, SMOOTH or INTEGER
+# captureDir: where to save a clip of every goal (see capture.py), or None
+# captureFormat: "png" for a folder of frames, "raw" for one rgb24 file
+# captureSeconds: seconds of the clips before the goal
+def main(aiColor=None, recordDir=None, server=None, tracePath=None, startupReport=False, arena=None, windowSize=None, scaleMode=SMOOTH,
+         captureDir=None, captureFormat="png", captureSeconds=None):
+    arena = Arena() if arena is None else arena
+    startup = StartupReport(STARTED)
+    startup.mark("imports")
+    # initialize pygame, only what the title screen needs (no sound, joysticks...)
+    pygame.display.init()
+    pygame.font.init()
+    assets.preload(BUTTON_IMAGES, (TITLE_FONT, DISPLAY_FONT, INFO_FONT, SCORE_FONT)) # found & loaded while the window opens
+    if windowSize is None:
+        display = ScaledDisplay(pygame.display.set_mode((arena.width, arena.height)), (arena.width, arena.height))
+    elif windowSize == "fullscreen":
+        display = ScaledDisplay(pygame.display.set_mode((0, 0), pygame.FULLSCREEN), (arena.width, arena.height), scaleMode)
+    else:
+        display = ScaledDisplay(pygame.display.set_mode(windowSize, pygame.RESIZABLE), (arena.width, arena.height), scaleMode)
+    DISPLAYSURF = display.surface # everything draws here, at the game's own size
     DISPLAYSURF.fill(GREEN)
     pygame.display.set_caption("Soccer")
-    clock = pygame.time.Clock()
-    pygame.font.init()
-    displayFont = pygame.font.SysFont("krungthep", DISPLAY_SIZE)
-    infoFont = pygame.font.SysFont("kefa", INFO_SIZE)
-    scoreFont = pygame.font.SysFont("menlo", SCORE_SIZE)
-    titleFont = pygame.font.SysFont("bradleyhand", TITLE_SIZE)
+    scheduler = FrameScheduler(FPS)
+    startup.mark("display")
+    titleFont = assets.font(*TITLE_FONT)
+    displayFont = assets.font(*DISPLAY_FONT)
+    startup.mark("fonts")
 
-    titleText = titleFont.render("Soccer", True, WHITE)
-    titleRect = titleText.get_rect(midtop=(SCREEN_WIDTH/2,0))
-    playButton = TextButton(GOLD, "Play", displayFont, WHITE)
+    titleText = textCache.render(titleFont, "Soccer", True, WHITE)
+    titleRect = titleText.get_rect(midtop=(arena.width/2,0))
+    playButton = TextButton(GOLD, "Play", displayFont, WHITE, (arena.width/2, arena.height/2))
 
-    infoButton = MenuButton(GOLD, (SCREEN_WIDTH-ICON_SIZE, SCREEN_HEIGHT-ICON_SIZE), "buttons/info.png")
+    infoButton = MenuButton(GOLD, (arena.width-ICON_SIZE, arena.height-ICON_SIZE), "buttons/info.png")
 
     # initialize game
-    objects = []
-
     selected = None
     startingX, startingY = 0,0
 
-    turn = BLUE
     nothingMoving = True
 
-    buttonsX = []
-    for i in range(NUM_BUTTONS):
-        buttonsX.append(BUTTON_GAP * (1+i) + ICON_SIZE*i)
-    grenadeButton = PowerupButton(pygame.Rect(buttonsX[0], BUTTON_Y, ICON_SIZE, ICON_SIZE), GRENADE, "buttons/grenade.png")
-    glueButton = PowerupButton(pygame.Rect(buttonsX[1], BUTTON_Y, ICON_SIZE, ICON_SIZE), GLUE, "buttons/glue.png")
-    buttons = [grenadeButton, glueButton]
+    buttons = None # made when the first game starts
+    profiler = FrameProfiler() # F3 in game shows it
+    if tracePath is not None:
+        profiler.startTrace(tracePath)
     selectedButton, selectedButtonObj = None, None # first is for game loop, second is to set the button instance variable's selected = False once powerup is used
-    powerup = True
+    firstFrame = True
     while 1:
         gameLoop = False
 
-        mouseX, mouseY = pygame.mouse.get_pos()
-        for event in pygame.event.get():
+        mouseX, mouseY = display.mouse()
+        for event in scheduler.events():
             if event.type == pygame.locals.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -397,7 +279,7 @@ def main():
                 if playButton.hovered:
                     gameLoop = True
                 if infoButton.hovered:
-                    infoDisplay(DISPLAYSURF, infoFont, clock, infoButton)
+                    infoDisplay(display, assets.font(*INFO_FONT), scheduler, infoButton)
         
         playButton.hovered = playButton.rect.collidepoint(mouseX, mouseY)
         infoButton.hovered = distance(infoButton.center[0], infoButton.center[1], mouseX, mouseY) <= ICON_SIZE/2
@@ -406,52 +288,119 @@ def main():
         DISPLAYSURF.blit(titleText, titleRect)
         playButton.draw(DISPLAYSURF)
         infoButton.draw(DISPLAYSURF)
-        pygame.display.update()
-        clock.tick(FPS)
+        display.update()
+        if firstFrame:
+            startup.mark("first frame")
+            if startupReport:
+                startup.print(sys.stderr)
+            firstFrame = False
+        scheduler.tick(idle=not gameLoop)
+        if not gameLoop:
+            continue
+
+        # game-only resources, the first time -----------
+        if buttons is None:
+            startup.skip() # only time making them, not the title screen before Play
+            from preview import ShotPreview
+            buttonsX = []
+            for i in range(NUM_BUTTONS):
+                buttonsX.append(BUTTON_GAP * (1+i) + ICON_SIZE*i)
+            buttonY = arena.height - Y_GAP/2 - ICON_SIZE/2 # same as BUTTON_Y, for any size of window
+            grenadeButton = PowerupButton(pygame.Rect(buttonsX[0], buttonY, ICON_SIZE, ICON_SIZE), GRENADE, "buttons/grenade.png")
+            glueButton = PowerupButton(pygame.Rect(buttonsX[1], buttonY, ICON_SIZE, ICON_SIZE), GLUE, "buttons/glue.png")
+            buttons = [grenadeButton, glueButton]
+            for button in buttons:
+                button.prebake()
+            sprites.get(("preview", GRENADE_SIZE, TRANSPARENT_BLACK), bakePreview, GRENADE_SIZE, TRANSPARENT_BLACK)
+            sprites.get(("preview", GLUE_SIZE, TRANSPARENT_YELLOW), bakePreview, GLUE_SIZE, TRANSPARENT_YELLOW)
+            scoreFont = assets.font(*SCORE_FONT)
+            if aiColor is not None:
+                from ai import ShotSearch, AI_SLICE
+            if recordDir is not None:
+                from replay import Recorder
+            if server is not None:
+                from net import Client, NetMatch
+            capture = None
+            if captureDir is not None: # the ring lives all session, matches take turns with it
+                from capture import GoalCapture, CAPTURE_SECONDS
+                capture = GoalCapture(DISPLAYSURF, captureDir, captureFormat, captureSeconds or CAPTURE_SECONDS)
+            startup.mark("game resources")
+            if startupReport:
+                startup.print(sys.stderr)
 
         # reset game variables -----------
-        glues = []
-
-        scored = True # start at True to set inital object positions   
-        blueScore = 0
-        redScore = 0
-        win = False
+        match = Match(arena)
+        renderer = DirtyRenderer(DISPLAYSURF, renderBackground(match.glues, match.arena))
+        glueLayout = []
+        preview = ShotPreview()
+        search = ShotSearch() if aiColor is not None else None
+        searching = False
+        # undo goes back to the start of the last turn a person took, two buffers reused all game
+        turnStart, undo = Snapshot(), Snapshot()
+        turnStartTurns, canUndo = -1, False
+        recorder = None
+        if recordDir is not None:
+            os.makedirs(recordDir, exist_ok=True)
+            recorder = Recorder(os.path.join(recordDir, time.strftime("match-%Y%m%d-%H%M%S.rpl")))
+            recorder.start(match)
+        net = None
+        if server is not None:
+            net = NetMatch(Client(*server, wake=lambda: pygame.event.post(pygame.event.Event(WAKE_EVENT))), match)
+        match.profiler = profiler
+        # everything made so far lives all game, the collector stops going through it (full collections were frame spikes in big arenas)
+        gc.freeze()
         while gameLoop:
+            profiler.begin()
             # handle scored -----------------------
             # let it run until everything stops moving, then reset
-            if scored:
-                stoppedMoving = True
-                for obj in objects:
-                    if obj.moving:
-                        stoppedMoving = False
-                        break
-                
-                if stoppedMoving and not win:
-                    ball = PhysicalObject(SCREEN_WIDTH/2, SCREEN_HEIGHT/2, BALL_MASS, BALL_SIZE, WHITE)
-                    objects = [ball]
-                    for spawn in SPAWNS:
-                        objects.append(Player(X_GAP + spawn[0], Y_GAP + spawn[1], BLUE))
-                        objects.append(Player(SCREEN_WIDTH - X_GAP - spawn[0], Y_GAP + spawn[1], RED))
-
-                    players = objects[1:]
-                    
-                    scored = False
-                    continue
+            if match.readyForKickoff():
+                if capture is not None:
+                    capture.flush() # the clip ends where the next kickoff starts
+                match.kickoff()
+                continue
+            profiler.mark(SCORING)
+
+            # online, the other side's inputs come in here, the same point in the frame as ours
+            if net is not None:
+                net.poll()
+                if net.closed:
+                    if net.client.error is not None:
+                        print("couldn't connect: %s" % net.client.error, file=sys.stderr)
+                    break
+            ours = match.turn != aiColor and (net is None or match.turn == net.color) # whether the person at this window plays this turn
+
+            if match.turns != turnStartTurns and ours and not match.scored and match.nothingMoving():
+                match.snapshot(turnStart)
+                turnStartTurns = match.turns
 
             # handle input -----------------------
             # hold click & drag to aim
-            mouseX, mouseY = pygame.mouse.get_pos()
-            for event in pygame.event.get():
+            mouseX, mouseY = display.mouse()
+            for event in scheduler.events():
                 if event.type == pygame.locals.QUIT:
                     pygame.quit()
                     sys.exit()
+
+                if event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_F3:
+                    profiler.toggle()
+
+                # replays & the other player only get the shots, so there's no undo while recording or online
+                if event.type == pygame.locals.KEYDOWN and event.key == pygame.locals.K_BACKSPACE and canUndo and match.recorder is None:
+                    match.restore(undo)
+                    canUndo, turnStartTurns, searching = False, -1, False
+                    if selected:
+                        selected.hovered = False
+                        selected = None
+                    if selectedButtonObj is not None:
+                        selectedButtonObj.selected = False
+                        selectedButton, selectedButtonObj = None, None
                             
-                if event.type == pygame.locals.MOUSEBUTTONDOWN and nothingMoving:
+                if event.type == pygame.locals.MOUSEBUTTONDOWN and nothingMoving and ours:
                     # on click, check if anything's selected
                     # if not, check the cursor is on any player to mark it as selected
                     if selected is None:
-                        for player in players:
-                            if player.color == turn and distance(mouseX, mouseY, player.x, player.y) <= PLAYER_SIZE:
+                        for player in match.players:
+                            if player.color == match.turn and distance(mouseX, mouseY, player.x, player.y) <= PLAYER_SIZE:
                                 # distance from any player is within the player size = mouse is on the circle
                                 startingX, startingY = mouseX, mouseY
                                 player.hovered = True # mark to draw the circle around it
@@ -459,7 +408,7 @@ def main():
                                 break
                     
                     # check for button click
-                    if powerup:
+                    if match.powerup:
                         for button in buttons:
                             if button.rect.collidepoint(mouseX, mouseY):
                                 if button.hovered: # click on hovered button = select/unselect the button
@@ -474,161 +423,193 @@ def main():
                 if event.type == pygame.locals.MOUSEBUTTONUP:
                     # on unclick, check if anything's selected
                     # if so, check if the cursor's outside the player
-                    if powerup: # unnecessary (but just an extra check), as button cannot be clicked if powerup is False
+                    if match.powerup and ours: # unnecessary (but just an extra check), as button cannot be clicked if powerup is False
                         if selectedButton == GRENADE:
-                            if inField(mouseX, mouseY):
-                                spawnGrenade(objects, mouseX, mouseY)
-                                powerup = False
+                            if match.placeGrenade(mouseX, mouseY):
                                 selectedButtonObj.selected = False
                                 selectedButton, selectedButtonObj = None, None
                         if selectedButton == GLUE:
-                            if inField(mouseX, mouseY):
-                                glues.append(FieldObject(mouseX, mouseY, GLUE_SIZE, YELLOW, lifetime = GLUE_LIFE))
-                                powerup = False
+                            if match.placeGlue(mouseX, mouseY):
                                 selectedButtonObj.selected = False
                                 selectedButton, selectedButtonObj = None, None
                     
                     # only handle player stuff if a powerup isn't selected
                     if (selectedButton is None) and (selected) and (distance(mouseX, mouseY, selected.x, selected.y) > PLAYER_SIZE):
-                        # calculate drag distance, applying a slight tweak
-                        vel = pygame.math.Vector2(-(mouseX-startingX)/AIM_TWEAK, -(mouseY-startingY)/AIM_TWEAK)
-                        
-                        # limit velocity to MAX_VEL
-                        if vel.magnitude_squared() > MAX_VEL**2: # can use vel.clamp_magnitude_ip(), but is experimental
-                            vel.scale_to_length(MAX_VEL)
-                        
-                        selected.v = vel
-
-                        player.hovered = False
+                        # launch from the drag distance, then swap turns, new round
+                        match.shoot(selected, shotVelocity(mouseX-startingX, mouseY-startingY))
+                        turnStart, undo = undo, turnStart # this turn's start is what undo goes back to
+                        canUndo = True
+
+                        selected.hovered = False
                         selected = None
 
-                        # swap turns, new round
-                        if turn == RED:
-                            turn = BLUE
-                        else:
-                            turn = RED
-                        powerup = True                    
-                        for glue in glues:
-                            glue.lifetime -=1
-                            if glue.lifetime == 0:
-                                glues.remove(glue)
-
-                    # if not, unselect the thing
-                    else:
-                        player.hovered = False
+                    # if not, unselect the thing (nothing's selected if the click didn't start on our turn)
+                    elif selected:
+                        selected.hovered = False
                         selected = None
             
+            profiler.mark(EVENTS)
+
             # update game -----------------------
-            fragsToRemove = []
-            nothingMoving = True
-            # check for wall collision
-            for obj in objects:
-                if obj.moving:
-                    nothingMoving = False
-                obj.handleWallCollision()
-                obj.updatePos(glues)
-
-                if (obj.type == "frag"):
-                    #if (not obj.moving):
-                    if (pygame.time.get_ticks()-obj.spawnTime > FRAG_LIFETIME):
-                        fragsToRemove.append(obj)
-            
-            for frag in fragsToRemove:
-                objects.remove(frag)
-            
-            pairs = [(a, b) for i, a in enumerate(objects) for b in objects[i+1:]]
-            for i in range(2):
-                for obj1, obj2 in pairs:
-                    if distance(obj1.x, obj1.y, obj2.x, obj2.y) <= obj1.size+obj2.size:
-                        obj1.handleCollision(obj2)
+            nothingMoving = match.nothingMoving()
+            scorer = None
+            if net is None or not net.paused(): # online, waits for the other player's input once everything stops
+                scorer = match.step()
+            profiler.mark(SCORING)
+
+            # computer's turn -----------------------
+            # searches a slice of every frame, so the window keeps drawing while it thinks
+            # after the step, so a shot taken this frame already counts as moving
+            if match.turn == aiColor and not match.scored and match.nothingMoving():
+                if not searching:
+                    search.start(match)
+                    searching = True
+                if search.think(AI_SLICE):
+                    match.play(search.best())
+                    searching = False
+            profiler.mark(COMPUTER)
             
             # display ----------------------------
-            DISPLAYSURF.fill(GREEN)
-            pygame.draw.rect(DISPLAYSURF, WHITE, pygame.Rect(X_GAP, Y_GAP, FIELD_WIDTH, FIELD_HEIGHT), 1) # field lines
-            pygame.draw.rect(DISPLAYSURF, BLUE, pygame.Rect(LEFT_GOAL_BACK, GOAL_TOP, GOAL_DEPTH, GOAL_HEIGHT), 1) # left goal
-            pygame.draw.rect(DISPLAYSURF, RED, pygame.Rect(X_GAP+FIELD_WIDTH, GOAL_TOP, GOAL_DEPTH, GOAL_HEIGHT), 1) # right goal
-            pygame.draw.line(DISPLAYSURF, GOLD, (X_GAP, GOAL_TOP), (X_GAP, GOAL_BOTTOM), 4) # left goal line
-            pygame.draw.line(DISPLAYSURF, GOLD, (X_GAP+FIELD_WIDTH, GOAL_TOP), (X_GAP+FIELD_WIDTH, GOAL_BOTTOM), 4) # right goal line
-            
-            # draw objects ----------------
-            for glue in glues:
-                glue.draw(DISPLAYSURF)
-            for obj in objects:
-                obj.draw(DISPLAYSURF)
+            # only what changed gets redrawn, over a cached picture of the field & glues
+            if [(glue.x, glue.y) for glue in match.glues] != glueLayout:
+                glueLayout = [(glue.x, glue.y) for glue in match.glues]
+                renderer.setBackground(renderBackground(match.glues, match.arena))
+            if selected: # predicted path of the shot, under the objects
+                preview.update(match.world, match.glues, [obj.color for obj in match.objects], selected.index, shotVelocity(mouseX-startingX, mouseY-startingY))
+                renderer.add("path", preview.rect, preview.signature(), preview.draw)
+            queueObjects(renderer, match)
             if selected:
-                pygame.draw.line(DISPLAYSURF, WHITE, (selected.x, selected.y), (mouseX, mouseY), SELECTED_THICKNESS)
+                lineRect = pygame.Rect(min(selected.x, mouseX), min(selected.y, mouseY), abs(selected.x-mouseX), abs(selected.y-mouseY)).inflate(SELECTED_THICKNESS*2, SELECTED_THICKNESS*2)
+                renderer.add("aim", lineRect, (selected.x, selected.y, mouseX, mouseY), pygame.draw.line, WHITE, (selected.x, selected.y), (mouseX, mouseY), SELECTED_THICKNESS)
             
             # draw buttons ----------------
             for button in buttons:
-                button.color = turn
+                button.color = match.turn
                 button.hovered = button.rect.collidepoint(mouseX, mouseY)
-                button.draw(DISPLAYSURF, powerupAvailable=powerup)
-                # DISPLAYSURF.blit(buttonSurf, (button.rect.left, button.rect.top))
+                renderer.add(button, button.rect, (button.color, button.hovered, button.selected, match.powerup), button.draw, match.powerup)
             
             if selectedButton is not None:
-                buttonText = scoreFont.render(selectedButton, True, turn)
-                buttonTextRect = buttonText.get_rect(midbottom=(SCREEN_WIDTH/2, Y_GAP))
-                DISPLAYSURF.blit(buttonText, buttonTextRect)
+                buttonText = textCache.render(scoreFont, selectedButton, True, match.turn)
+                buttonTextRect = buttonText.get_rect(midbottom=(arena.width/2, Y_GAP))
+                renderer.add("buttonText", buttonTextRect, (selectedButton, match.turn), pygame.Surface.blit, buttonText, buttonTextRect)
             if selectedButton == GRENADE:
-                alphaSurf = pygame.Surface((GRENADE_SIZE*2, GRENADE_SIZE*2), pygame.SRCALPHA) # new surface to draw the transparency
-                pygame.draw.circle(alphaSurf, TRANSPARENT_BLACK, (GRENADE_SIZE, GRENADE_SIZE), GRENADE_SIZE)
-                DISPLAYSURF.blit(alphaSurf, (mouseX-GRENADE_SIZE, mouseY-GRENADE_SIZE))
+                renderer.add("preview", pygame.Rect(mouseX-GRENADE_SIZE, mouseY-GRENADE_SIZE, GRENADE_SIZE*2, GRENADE_SIZE*2), (GRENADE, mouseX, mouseY), drawPreview, GRENADE_SIZE, TRANSPARENT_BLACK, (mouseX, mouseY))
             if selectedButton == GLUE:
-                alphaSurf = pygame.Surface((GLUE_SIZE*2, GLUE_SIZE*2), pygame.SRCALPHA)
-                pygame.draw.circle(alphaSurf, TRANSPARENT_YELLOW, (GLUE_SIZE, GLUE_SIZE), GLUE_SIZE)
-                DISPLAYSURF.blit(alphaSurf, (mouseX-GLUE_SIZE, mouseY-GLUE_SIZE))
+                renderer.add("preview", pygame.Rect(mouseX-GLUE_SIZE, mouseY-GLUE_SIZE, GLUE_SIZE*2, GLUE_SIZE*2), (GLUE, mouseX, mouseY), drawPreview, GLUE_SIZE, TRANSPARENT_YELLOW, (mouseX, mouseY))
             
+            profiler.mark(DRAWING)
+
             # show turn ----------------
             # blinks for a moment, fix:
             # nothingMoving is true the frame when a player moves, even as the turn switches, so the new turn flashes before nothing shows bc there's movement
-            if nothingMoving and not scored:
-                if turn == BLUE:
-                    turnText = scoreFont.render("Blue Turn", True, BLUE)
-                if turn == RED:
-                    turnText = scoreFont.render("Red Turn", True, RED)
-                turnTextRect = turnText.get_rect(midtop=(SCREEN_WIDTH/2, 0))
-                DISPLAYSURF.blit(turnText, turnTextRect)
+            if nothingMoving and not match.scored:
+                if match.turn == BLUE:
+                    turnText = textCache.render(scoreFont, "Blue Turn", True, BLUE)
+                if match.turn == RED:
+                    turnText = textCache.render(scoreFont, "Red Turn", True, RED)
+                turnTextRect = turnText.get_rect(midtop=(arena.width/2, 0))
+                renderer.add("turnText", turnTextRect, match.turn, pygame.Surface.blit, turnText, turnTextRect)
                 
-            # detect for scoring ----------------
-            if (ball.x < X_GAP and not scored):
-                redScore += 1
-                scored = True
-                if (redScore >= WIN_SCORE):
-                    displayText = displayFont.render("RED WINS", True, RED)
-                    win = True
+            if net is not None and not net.started:
+                waitingText = textCache.render(displayFont, "Waiting for an opponent", True, WHITE)
+                waitingRect = waitingText.get_rect(center=(arena.width/2, arena.height/2))
+                renderer.add("waiting", waitingRect, None, pygame.Surface.blit, waitingText, waitingRect)
+
+            # show scoring ----------------
+            if scorer == RED:
+                if match.win:
+                    displayText = textCache.render(displayFont, "RED WINS", True, RED)
                 else:
-                    displayText = displayFont.render("RED SCORE", True, RED)
-                displayTextRect = displayText.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2))
-                turn = BLUE
-                powerup = False
-                scoreTime = pygame.time.get_ticks()
-            if (ball.x > X_GAP+FIELD_WIDTH and not scored):
-                blueScore += 1
-                scored = True
-                if (blueScore >= WIN_SCORE):
-                    displayText = displayFont.render("BLUE WINS", True, BLUE)
-                    win = True
+                    displayText = textCache.render(displayFont, "RED SCORE", True, RED)
+            if scorer == BLUE:
+                if match.win:
+                    displayText = textCache.render(displayFont, "BLUE WINS", True, BLUE)
                 else:
-                    displayText = displayFont.render("BLUE SCORE", True, BLUE)
-                displayTextRect = displayText.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2))
-                turn = RED
-                powerup = False
+                    displayText = textCache.render(displayFont, "BLUE SCORE", True, BLUE)
+            if scorer is not None:
+                displayTextRect = displayText.get_rect(center=(arena.width/2, arena.height/2))
                 scoreTime = pygame.time.get_ticks()
             
-            if scored and pygame.time.get_ticks() - scoreTime < 5000: # keep SCORED text on 5 seconds after score
-                DISPLAYSURF.blit(displayText, displayTextRect)
-            if win and pygame.time.get_ticks() - scoreTime > 5000:
+            if match.scored and pygame.time.get_ticks() - scoreTime < BANNER_TIME: # keep SCORED text on 5 seconds after score
+                renderer.add("displayText", displayTextRect, (match.blueScore, match.redScore), pygame.Surface.blit, displayText, displayTextRect)
+            if match.win and pygame.time.get_ticks() - scoreTime > BANNER_TIME:
                 gameLoop = False # after win, leave after 5 seconds
 
             # show score for blue & red ----------------
-            DISPLAYSURF.blit(scoreFont.render("Blue score: " + str(blueScore), True, BLUE), (0,0))
-            redScoreText = scoreFont.render("Red score: " + str(redScore), True, RED)
-            redScoreRect = redScoreText.get_rect(topright = (SCREEN_WIDTH, 0))
-            DISPLAYSURF.blit(redScoreText, redScoreRect)
-
-            # update window
-            pygame.display.update()
-            clock.tick(FPS)
+            blueScoreText = textCache.render(scoreFont, "Blue score: " + str(match.blueScore), True, BLUE)
+            blueScoreRect = blueScoreText.get_rect(topleft = (0, 0))
+            renderer.add("blueScore", blueScoreRect, match.blueScore, pygame.Surface.blit, blueScoreText, blueScoreRect)
+            redScoreText = textCache.render(scoreFont, "Red score: " + str(match.redScore), True, RED)
+            redScoreRect = redScoreText.get_rect(topright = (arena.width, 0))
+            renderer.add("redScore", redScoreRect, match.redScore, pygame.Surface.blit, redScoreText, redScoreRect)
+
+            if profiler.enabled:
+                renderer.add("profiler", profiler.overlayRect(), profiler.signature(), profiler.draw)
+            profiler.mark(HUD)
+
+            # update window, only where something changed
+            dirty = renderer.render()
+            if capture is not None:
+                if scorer is not None:
+                    capture.goal()
+                capture.grab()
+            profiler.mark(DRAWING)
+            display.present(renderer, dirty)
+            profiler.mark(DISPLAY)
+            # everything asleep & no one aiming or thinking: sleep until an event, or the score banner's time is up
+            # online, a paused game sleeps too (bodies don't get to fall asleep while it skips steps), the other side's messages wake it
+            waiting = net is not None and net.paused()
+            idle = (waiting or match.world.allAsleep() and (net is None or not net.pending)) and selected is None and match.turn != aiColor
+            scheduler.tick(idle, BANNER_TIME - (pygame.time.get_ticks() - scoreTime) if match.scored else None)
+            profiler.mark(IDLE)
+            profiler.end(match.world.count, match.world.pairCount)
+
+        gc.unfreeze() # this game's world & everything pointing back at it can go now
+        gc.collect()
+        if recorder is not None:
+            recorder.close()
+        if capture is not None:
+            capture.flush()
+        if net is not None:
+            net.client.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Soccer, for two players or against the computer.")
+    parser.add_argument("--ai", choices=("blue", "red"), help="the computer plays this team")
+    parser.add_argument("--record", metavar="DIR", help="save a replay of every match here (watch with replay.py)")
+    parser.add_argument("--connect", type=address, metavar="HOST:PORT", help="play online through a relay started with net.py serve")
+    parser.add_argument("--trace", metavar="FILE", help="save how long each phase of the last few minutes of frames took, as a chrome trace, on exit")
+    parser.add_argument("--startup-report", action="store_true", help="print how long each step of starting up took")
+    parser.add_argument("--arena", type=size, metavar="WIDTHxHEIGHT", help="size of the field (default %dx%d), the window grows with it" % (FIELD_WIDTH, FIELD_HEIGHT))
+    parser.add_argument("--players", type=int, default=len(SPAWNS), help="players per team")
+    parser.add_argument("--balls", type=int, default=1)
+    parser.add_argument("--window", type=size, metavar="WIDTHxHEIGHT", help="open a resizable window this big, the game is scaled to fit it")
+    parser.add_argument("--fullscreen", action="store_true", help="fill the screen, the game is scaled to fit it")
+    parser.add_argument("--scale", choices=(SMOOTH, INTEGER), default=SMOOTH, help="how the game is scaled up: smooth fills the window, integer keeps pixels sharp (default %(default)s)")
+    parser.add_argument("--capture", metavar="DIR", help="save a clip of the last few seconds before every goal here")
+    parser.add_argument("--capture-format", choices=("png", "raw"), default="png", help="a folder of PNGs a clip, or one raw rgb24 file (default %(default)s)")
+    parser.add_argument("--capture-seconds", type=float, help="seconds of the clips before the goal, there's another second after it (default 3)")
+    args = parser.parse_args()
+    server = None
+    if args.connect is not None:
+        if args.ai or args.record:
+            parser.error("--connect can't be used with --ai or --record")
+        server = args.connect
+    fieldWidth, fieldHeight = args.arena or (FIELD_WIDTH, FIELD_HEIGHT)
+    if args.players < 1 or args.balls < 1:
+        parser.error("there has to be at least one player a team & one ball")
+    custom = args.arena is not None or args.players != len(SPAWNS) or args.balls != 1
+    if custom and (args.ai or args.connect or args.record): # the computer's rollouts, replays & the other side only know the classic arena
+        parser.error("--arena, --players & --balls can't be used with --ai, --connect or --record")
+    arena = Arena(fieldWidth, fieldHeight, args.players, args.balls)
+    windowSize = None
+    if args.window is not None:
+        if args.fullscreen:
+            parser.error("--window can't be used with --fullscreen")
+        windowSize = args.window
+    elif args.fullscreen:
+        windowSize = "fullscreen"
+    if args.capture_seconds is not None and args.capture_seconds <= 0:
+        parser.error("--capture-seconds has to be more than 0")
+    main({"blue": BLUE, "red": RED}.get(args.ai), args.record, server, args.trace, args.startup_report, arena, windowSize, args.scale,
+         args.capture, args.capture_format, args.capture_seconds)
\ No newline at end of file